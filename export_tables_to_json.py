@@ -15,7 +15,7 @@ def load_all_tables_from_db(db_path: str) -> List[Dict[str, Any]]:
         cur.execute("SELECT table_id, section_name, title, headers, merged_headers, rows, stub_col, paragraphs FROM context_packs")
         
         tables = []
-        for row in cur.fetchall():
+        for row in cur:
             table_id, section_name, title, headers, merged_headers, rows, stub_col, paragraphs = row
             
             table_data = {
@@ -23,11 +23,20 @@ from pathlib import Path
 from datetime import datetime
 
 # Import from project modules
-from json_utils import clean_json_response
+from json_utils import clean_json_response, repair_json_response
 from logger import logger
 from model import MODEL_CONFIGS, ModelManager
-from validate import validate_kpi_indexed
-from loader import load_tables_from_db, load_existing_results, save_checkpoint
+from result_cache import ResultCache
+from validate import build_fix_instructions, prepare_source_table, validate_kpi_indexed
+from loader import (
+    load_tables_from_db,
+    load_processed_ids,
+    iter_checkpoint_results,
+    convert_legacy_checkpoint,
+    append_result,
+    count_jsonl_tables,
+    iter_tables_from_jsonl,
+)
 
 # ============================================================================
 # CONFIGURATION
@@ -166,7 +175,7 @@ class KPIExtractor:
     three different language models to extract KPIs from financial tables.
     """
     
-    def __init__(self, models_to_use: Optional[List[str]] = None, temperature: float = 0.1):
+    def __init__(self, models_to_use: Optional[List[str]] = None, temperature: float = 0.0):
         """
         Initialize the extractor with specified models.
         
@@ -176,6 +185,8 @@ class KPIExtractor:
         self.models_to_use = models_to_use or list(MODEL_CONFIGS.keys())
         # Use ModelManager for model loading/unloading
         self.model_manager = ModelManager(temperature=temperature)
+        # Content-hash result cache, opened per output directory by the process_* methods
+        self.result_cache = None
         
         logger.info(f"Initializing Multi-Model KPI Extractor with {len(self.models_to_use)} models")
         logger.info("Models will be loaded sequentially on-demand to save memory")
@@ -186,6 +197,57 @@ class KPIExtractor:
         table_data: Dict[str, Any],
         model_name: str,
         max_correction_iterations: int = 3
+    ) -> Dict[str, Any]:
+        """
+        Extract KPIs using a single model, reusing cached results for identical tables.
+        
+        Args:
+            table_data: Dictionary containing table information
+            model_name: Name of the model to use
+            max_correction_iterations: Maximum correction attempts (0 = no validation)
+            
+        Returns:
+            Dictionary with extracted KPIs and metadata
+        """
+        if self.result_cache is None:
+            return self._extract_kpis_uncached(table_data, model_name, max_correction_iterations)
+        
+        table_hash = self.result_cache.table_key(
+            table_data, self._cache_settings(model_name, max_correction_iterations)
+        )
+        cached = self.result_cache.get(model_name, table_hash)
+        if cached is not None:
+            logger.info(f"    ✓ Reusing cached result for identical table ({model_name})")
+            return cached
+        
+        result = self._extract_kpis_uncached(table_data, model_name, max_correction_iterations)
+        if "error" not in result:
+            self.result_cache.put(model_name, table_hash, result)
+        return result
+    
+    def _cache_settings(self, model_name: str, max_correction_iterations: int) -> Dict[str, Any]:
+        """
+        Collect the settings besides the table that change an extraction result.
+        
+        Args:
+            model_name: Name of the model to use
+            max_correction_iterations: Maximum correction attempts (0 = no validation)
+            
+        Returns:
+            Dictionary hashed into the result cache key
+        """
+        return {
+            "max_correction_iterations": max_correction_iterations,
+            "system_prompt": SYSTEM_PROMPT,
+            "temperature": self.model_manager.temperature,
+            "model_config": MODEL_CONFIGS.get(model_name),
+        }
+    
+    def _extract_kpis_uncached(
+        self,
+        table_data: Dict[str, Any],
+        model_name: str,
+        max_correction_iterations: int = 3
     ) -> Dict[str, Any]:
         """
         Extract KPIs using a single model with validation-based correction.
@@ -208,7 +270,7 @@ class KPIExtractor:
             }
         
         # Load model if not already loaded or if different model is loaded
-        if self.model_manager.current_model_name != model_name:
+        if self.model_manager.current_model_name != model_name and not self.model_manager.use_model(model_name):
             # Unload previous model if any
             if self.model_manager.current_model is not None:
                 self.model_manager.unload_model()
@@ -230,7 +292,7 @@ class KPIExtractor:
             config = MODEL_CONFIGS[model_name]
             max_new_tokens = config.get("max_new_tokens", 2048)
             logger.info(f"    → Generating tokens (max: {max_new_tokens} ...")
-            generated_text = self.model_manager.generate_text(prompt)
+            generated_text = self.model_manager.generate_text(prompt, prefix=SYSTEM_PROMPT)
             logger.info(f"    → Generation complete. Decoding output...")
             
             # Save initial extraction output to file
@@ -279,10 +341,31 @@ class KPIExtractor:
                     }
                     
             except json.JSONDecodeError as e:
-                # Try to recover by asking LLM to continue/fix the JSON
                 table_id = table_data.get('table_id', 'unknown')
                 logger.warning(f"  JSON parsing failed for {model_name}: {str(e)}")
                 
+                # Try to salvage the already generated output before asking the LLM again
+                repaired = repair_json_response(cleaned_text)
+                if repaired is not None and isinstance(repaired.get("kpis"), list):
+                    for kpi in repaired["kpis"]:
+                        kpi["source_model"] = model_name
+                    
+                    repaired["model"] = model_name
+                    repaired["num_kpis"] = len(repaired["kpis"])
+                    repaired["repaired"] = True
+                    logger.info(f"    ✓ Repaired JSON locally, recovered {repaired['num_kpis']} KPIs")
+                    
+                    if max_correction_iterations > 0:
+                        repaired = self._validate_and_correct(
+                            table_data,
+                            repaired,
+                            model_name,
+                            max_correction_iterations
+                        )
+                    
+                    return repaired
+                
+                # Try to recover by asking LLM to continue/fix the JSON
                 result = self._recover_json(
                     cleaned_text,
                     str(e),
@@ -292,10 +375,12 @@ class KPIExtractor:
                 )
                 
                 if "error" in result:
+                    # The full generated text lives in the debug file, never in the results JSON
                     return {
                         "kpis": [],
                         "model": model_name,
-                        "error": f"JSON parsing failed: {str(e)}. {result['error']}"
+                        "error": f"JSON parsing failed: {str(e)}. {result['error']}",
+                        "raw_output_path": result.get("raw_output_path")
                     }
                 
                 # Run validation loop if enabled
@@ -316,10 +401,6 @@ class KPIExtractor:
                 "model": model_name,
                 "error": str(e)
             }
-        finally:
-            # Clean up GPU memory after each extraction to prevent buildup
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
     
     def _validate_and_correct(
         self,
@@ -341,6 +422,8 @@ class KPIExtractor:
             Updated extraction result with validation stats
         """
         main_kpis = extraction_result.get("kpis", [])
+        # Parsed cells and label lookups, built once for every iteration
+        source = prepare_source_table(table_data)
         
         for iteration in range(1, max_iterations + 1):
             logger.info(f"    → Validation iteration {iteration}/{max_iterations}...")
@@ -350,9 +433,9 @@ class KPIExtractor:
             invalid_kpis = []
             
             for kpi in main_kpis:
-                validation = validate_kpi_indexed(kpi, table_data)
+                validation = validate_kpi_indexed(kpi, table_data, source)
                 
-                if validation["is_valid"]:
+                if validation.is_valid:
                     valid_kpis.append(kpi)
                 else:
                     invalid_kpis.append({
@@ -388,8 +471,10 @@ class KPIExtractor:
                 extraction_result["invalid_kpis"] = [inv["kpi"] for inv in invalid_kpis]
                 break
             
-            # Attempt correction
+            # Attempt correction; FIX lines are only built for KPIs sent back to the model
             logger.info(f"    → Correcting {invalid_count} invalid KPIs...")
+            for inv in invalid_kpis:
+                build_fix_instructions(inv["validation"], inv["kpi"], table_data, source=source)
             corrected_result = self._correct_invalid_kpis(
                 table_data,
                 main_kpis,
@@ -560,11 +645,9 @@ OUTPUT FORMAT (JSON only, no extra text):
             logger.warning(f"  Debug file saved: {raw_output_path}")
             
             return {
-                "error": f"JSON recovery failed: {str(recovery_error)}"
+                "error": f"JSON recovery failed: {str(recovery_error)}",
+                "raw_output_path": raw_output_path
             }
-        finally:
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
     
     def _correct_invalid_kpis(
         self,
@@ -593,16 +676,16 @@ OUTPUT FORMAT (JSON only, no extra text):
                 val = inv["validation"]
                 error_msg = f"""ERROR {i}:
   KPI: {json.dumps(kpi, indent=2)}
-  Issues: {', '.join(val['errors'])}
-  Expected: row_idx={val['row_idx']}, col_idx={val['col_idx']}
-  stub_col[{val['row_idx']}] = '{val.get('row_name_match', '')}'
-  merged_headers[{val['col_idx']}] = '{val.get('col_name_match', '')}'
-  Source: {val['source_cell_value']} (text: \"{val['source_cell_text']}\")
-  Extracted: {val['extracted_value']}"""
+  Issues: {', '.join(val.errors)}
+  Expected: row_idx={val.row_idx}, col_idx={val.col_idx}
+  stub_col[{val.row_idx}] = '{val.row_name_match}'
+  merged_headers[{val.col_idx}] = '{val.col_name_match}'
+  Source: {val.source_cell_value} (text: \"{val.source_cell_text}\")
+  Extracted: {val.extracted_value}"""
                 
                 # Add specific fix instructions from validation
-                if val.get('fix_instructions'):
-                    error_msg += "\n\n  " + "\n  ".join(val['fix_instructions'])
+                if val.fix_instructions:
+                    error_msg += "\n\n  " + "\n  ".join(val.fix_instructions)
                 
                 error_details.append(error_msg)
             
@@ -733,9 +816,6 @@ REMEMBER:
             }
         except Exception as e:
             return {"error": str(e)}
-        finally:
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
     
     def process_database(
         self,
@@ -768,6 +848,7 @@ REMEMBER:
         """
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
+        self.result_cache = ResultCache(output_path / ".cache.sqlite")
         
         logger.info("=" * 70)
         logger.info(f"Multi-Model KPI Extraction Pipeline (Database Mode)")
@@ -818,24 +899,27 @@ REMEMBER:
                 
                 # Determine output file name for this year (with checkpoint prefix)
                 job_suffix = f"_{job_id}" if job_id else ""
-                checkpoint_file = output_path / f"checkpoint_{timestamp}{job_suffix}_{model_name}_year{year}_kpis.json"
+                checkpoint_file = output_path / f"checkpoint_{timestamp}{job_suffix}_{model_name}_year{year}_kpis.jsonl"
                 output_file = checkpoint_file  # Start with checkpoint file
                 
                 # Check for existing checkpoint
                 processed_ids = set()
-                model_results = []
                 
                 if resume:
+                    # Checkpoints written before the JSONL format are converted once
+                    for legacy_file in output_path.glob(f"checkpoint_*_{model_name}_year{year}_kpis.json"):
+                        convert_legacy_checkpoint(legacy_file)
+                    
                     # Try to find existing checkpoint file for this model/year combination
                     # Look for any file matching the pattern (with checkpoint prefix)
-                    pattern = f"checkpoint_*_{model_name}_year{year}_kpis.json"
+                    pattern = f"checkpoint_*_{model_name}_year{year}_kpis.jsonl"
                     existing_files = list(output_path.glob(pattern))
                     
                     if existing_files:
                         # Use the most recent checkpoint file
                         checkpoint_file = max(existing_files, key=lambda p: p.stat().st_mtime)
                         logger.info(f"Found checkpoint file: {checkpoint_file.name}")
-                        model_results, processed_ids = load_existing_results(checkpoint_file)
+                        processed_ids = load_processed_ids(checkpoint_file)
                         
                         # Use the existing checkpoint file
                         output_file = checkpoint_file
@@ -874,17 +958,15 @@ REMEMBER:
                         result['table_data'] = table_data
                         result['processing_timestamp'] = datetime.now().isoformat()
                         
-                        # Append to results
-                        model_results.append(result)
                         processed_ids.add(table_id)
                         
                         # Log summary
                         num_kpis = len(result.get('kpis', []))
                         logger.info(f"    → Extracted {num_kpis} KPIs")
                         
-                        # Save checkpoint after each table
-                        save_checkpoint(output_file, model_results, model_name, year)
-                        logger.info(f"    → Checkpoint saved ({len(model_results)} tables total)")
+                        # Append this table to the checkpoint
+                        append_result(output_file, result)
+                        logger.info(f"    → Checkpoint saved ({len(processed_ids)} tables total)")
                         
                     except Exception as e:
                         logger.error(f"    ✗ Error processing {table_id}: {str(e)}")
@@ -894,16 +976,17 @@ REMEMBER:
                             'error': str(e),
                             'processing_timestamp': datetime.now().isoformat()
                         }
-                        model_results.append(error_result)
                         processed_ids.add(table_id)
                         
-                        # Save checkpoint even with error
-                        save_checkpoint(output_file, model_results, model_name, year)
+                        # Checkpoint the error too so it is not retried on resume
+                        append_result(output_file, error_result)
                         logger.info(f"    → Checkpoint saved (with error)")
                 
-                # Final save with complete metadata (remove checkpoint prefix)
+                # Final save with complete metadata (remove checkpoint prefix).
+                # Results live only in the checkpoint until now, so read them back once.
                 logger.info("")
                 logger.info(f"Finalizing results: {output_file.name}")
+                model_results = list(iter_checkpoint_results(output_file))
                 final_data = {
                     "metadata": {
                         "model": model_name,
@@ -918,7 +1001,7 @@ REMEMBER:
                 }
                 
                 # Create final filename without checkpoint prefix
-                final_filename = output_file.name.replace("checkpoint_", "")
+                final_filename = output_file.with_suffix(".json").name.replace("checkpoint_", "")
                 final_file = output_path / final_filename
                 
                 with open(final_file, 'w', encoding='utf-8') as f_out:
@@ -944,8 +1027,12 @@ REMEMBER:
         logger.info(f"All models completed!")
         logger.info(f"  Years processed: {', '.join(years_to_process)}")
         logger.info(f"  Models used: {len(self.models_to_use)}")
+        logger.info(f"  Cached results reused: {self.result_cache.hits}")
         logger.info(f"  Output directory: {output_dir}")
         logger.info("=" * 70)
+        
+        self.result_cache.close()
+        self.result_cache = None
     
     def process_jsonl_files(
         self,
@@ -999,44 +1086,84 @@ REMEMBER:
         logger.info(f"Max tables per file: {max_tables if max_tables else 'All'}")
         logger.info("=" * 70)
         
-        # Load all tables from all JSONL files
-        logger.info("Loading tables from input files...")
-        all_file_tables = []  # List of (input_file, tables) tuples
+        # Count tables per file up front; tables themselves are streamed per model
+        logger.info("Counting tables in input files...")
+        all_file_tables = []  # List of (input_file, num_tables) tuples
         
         for input_file in valid_files:
-            logger.info(f"  Loading: {Path(input_file).name}")
-            tables = []
-            errors = 0
-            
-            with open(input_file, 'r', encoding='utf-8') as f_in:
-                for line_num, line in enumerate(f_in, 1):
-                    # Check if we've hit the limit
-                    if max_tables and len(tables) >= max_tables:
-                        logger.info(f"    Reached maximum table limit ({max_tables})")
-                        break
-                    
-                    try:
-                        table_data = json.loads(line)
-                        tables.append(table_data)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"    Invalid JSON on line {line_num}: {str(e)}")
-                        errors += 1
+            num_tables = count_jsonl_tables(input_file, max_tables)
+            logger.info(f"  {Path(input_file).name}: {num_tables} tables")
             
-            logger.info(f"    Loaded {len(tables)} tables (errors: {errors})")
-            
-            if tables:
-                all_file_tables.append((input_file, tables))
+            if num_tables:
+                all_file_tables.append((input_file, num_tables))
         
-        total_tables = sum(len(tables) for _, tables in all_file_tables)
-        logger.info(f"Total tables loaded: {total_tables} from {len(all_file_tables)} files")
+        total_tables = sum(num_tables for _, num_tables in all_file_tables)
+        logger.info(f"Total tables to process: {total_tables} from {len(all_file_tables)} files")
         
         if not all_file_tables:
             logger.error("No tables to process!")
             return
         
-        # Process each model separately
+        self.result_cache = ResultCache(output_path / ".cache.sqlite")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
+        # Keep all models on the GPUs at once if they fit, otherwise rewind per model
+        placements = self.model_manager.plan_co_residence(self.models_to_use)
+        if placements:
+            self._process_jsonl_files_co_resident(
+                all_file_tables,
+                placements,
+                output_path,
+                max_tables,
+                timestamp,
+                job_id,
+                max_correction_iterations
+            )
+        else:
+            self._process_jsonl_files_sequential(
+                all_file_tables,
+                output_path,
+                max_tables,
+                timestamp,
+                job_id,
+                max_correction_iterations
+            )
+        
+        # Final summary
+        logger.info("")
+        logger.info("=" * 70)
+        logger.info(f"All models completed!")
+        logger.info(f"  Total input files: {len(all_file_tables)}")
+        logger.info(f"  Total tables processed: {total_tables}")
+        logger.info(f"  Models used: {len(self.models_to_use)}")
+        logger.info(f"  Cached results reused: {self.result_cache.hits}")
+        logger.info(f"  Output directory: {output_dir}")
+        logger.info("=" * 70)
+        
+        self.result_cache.close()
+        self.result_cache = None
+    
+    def _process_jsonl_files_sequential(
+        self,
+        all_file_tables: List,
+        output_path: Path,
+        max_tables: Optional[int],
+        timestamp: str,
+        job_id: Optional[str],
+        max_correction_iterations: int
+    ) -> None:
+        """
+        Process JSONL files one model at a time (load, run all files, unload).
+        
+        Args:
+            all_file_tables: List of (input_file, num_tables) tuples
+            output_path: Directory for output files
+            max_tables: Maximum number of tables to process per file (None = all)
+            timestamp: Run timestamp used in output filenames
+            job_id: Optional SLURM job ID for filename
+            max_correction_iterations: Maximum validation/correction iterations (0 = disabled)
+        """
+        # Process each model separately
         for model_name in self.models_to_use:
             logger.info("")
             logger.info("#" * 70)
@@ -1049,17 +1176,16 @@ REMEMBER:
                 continue
             
             # Process each input file with this model (model stays loaded)
-            for file_idx, (input_file, tables) in enumerate(all_file_tables, 1):
-                input_filename = Path(input_file).stem  # e.g., "linked_tables(2023)"
+            for file_idx, (input_file, num_tables) in enumerate(all_file_tables, 1):
                 logger.info("")
                 logger.info(f"Processing file {file_idx}/{len(all_file_tables)}: {Path(input_file).name}")
-                logger.info(f"  Tables in this file: {len(tables)}")
+                logger.info(f"  Tables in this file: {num_tables}")
                 
-                # Process all tables from this file
+                # Stream all tables from this file
                 model_results = []
-                for idx, table_data in enumerate(tables, 1):
+                for idx, table_data in enumerate(iter_tables_from_jsonl(input_file, max_tables), 1):
                     table_id = table_data.get('table_id', 'unknown')
-                    logger.info(f"  [{idx}/{len(tables)}] Processing table: {table_id}")
+                    logger.info(f"  [{idx}/{num_tables}] Processing table: {table_id}")
                     
                     try:
                         result = self.extract_kpis(
@@ -1067,20 +1193,7 @@ REMEMBER:
                             model_name,
                             max_correction_iterations
                         )
-                        
-                        # Add table metadata to result
-                        result_with_metadata = {
-                            "table_id": table_data.get("table_id"),
-                            "doc_id": table_data.get("doc_id"),
-                            "year": table_data.get("year"),
-                            "section_name": table_data.get("section_name"),
-                            "title": table_data.get("title"),
-                            "extraction_timestamp": datetime.now().isoformat(),
-                            "model": model_name,
-                            "extraction_result": result
-                        }
-                        
-                        model_results.append(result_with_metadata)
+                        model_results.append(self._table_result_with_metadata(table_data, model_name, result))
                         
                     except torch.cuda.OutOfMemoryError as e:
                         logger.error(f"    CUDA OOM error on table {table_id}: {str(e)}")
@@ -1100,62 +1213,185 @@ REMEMBER:
                             "error": str(e)
                         })
                 
-                # Create filename for this input file + model combination
-                if job_id:
-                    output_filename = f"{job_id}_{timestamp}_{model_name}_{input_filename}.json"
-                else:
-                    output_filename = f"kpis_{timestamp}_{model_name}_{input_filename}.json"
-                
-                output_file = output_path / output_filename
-                
-                # Write results to JSON file
-                logger.info(f"  Writing results to: {output_filename}")
-                
-                output_data = {
-                    "metadata": {
-                        "model": model_name,
-                        "input_file": str(input_file),
-                        "extraction_timestamp": datetime.now().isoformat(),
-                        "num_tables_processed": len(model_results),
-                        "job_id": job_id
-                    },
-                    "tables": model_results
-                }
-                
-                with open(output_file, 'w', encoding='utf-8') as f_out:
-                    json.dump(output_data, f_out, ensure_ascii=False, indent=2)
-                
-                # Calculate statistics for this file
-                total_kpis = 0
-                successful = 0
-                failed = 0
-                
-                for result in model_results:
-                    if "error" in result:
-                        failed += 1
-                    else:
-                        successful += 1
-                        extraction_result = result.get("extraction_result", {})
-                        if "kpis" in extraction_result:
-                            total_kpis += len(extraction_result.get("kpis", []))
-                
-                logger.info(f"  ✓ Completed {Path(input_file).name}:")
-                logger.info(f"    - Tables: {len(model_results)}, Successful: {successful}, Failed: {failed}")
-                logger.info(f"    - KPIs extracted: {total_kpis}")
+                self._write_jsonl_results(output_path, input_file, model_name, model_results, timestamp, job_id)
             
             # Unload model after processing all files
             logger.info(f"\n✓ {model_name} completed all {len(all_file_tables)} files")
             self.model_manager.unload_model()
+    
+    def _process_jsonl_files_co_resident(
+        self,
+        all_file_tables: List,
+        placements: Dict[str, Dict],
+        output_path: Path,
+        max_tables: Optional[int],
+        timestamp: str,
+        job_id: Optional[str],
+        max_correction_iterations: int
+    ) -> None:
+        """
+        Process JSONL files with all models loaded on the GPUs at the same time.
         
-        # Final summary
+        The loop nesting is inverted compared to the sequential path: each table
+        is read once and handed to every model in turn, so no model is ever
+        reloaded between files.
+        
+        Args:
+            all_file_tables: List of (input_file, num_tables) tuples
+            placements: Per-model max_memory dicts from ModelManager.plan_co_residence()
+            output_path: Directory for output files
+            max_tables: Maximum number of tables to process per file (None = all)
+            timestamp: Run timestamp used in output filenames
+            job_id: Optional SLURM job ID for filename
+            max_correction_iterations: Maximum validation/correction iterations (0 = disabled)
+        """
         logger.info("")
-        logger.info("=" * 70)
-        logger.info(f"All models completed!")
-        logger.info(f"  Total input files: {len(all_file_tables)}")
-        logger.info(f"  Total tables processed: {total_tables}")
-        logger.info(f"  Models used: {len(self.models_to_use)}")
-        logger.info(f"  Output directory: {output_dir}")
-        logger.info("=" * 70)
+        logger.info("#" * 70)
+        logger.info(f"All models fit on the available GPUs, loading them co-resident")
+        logger.info("#" * 70)
+        
+        loaded_models = []
+        for model_name in self.models_to_use:
+            if self.model_manager.load_model(model_name, max_memory=placements[model_name]):
+                loaded_models.append(model_name)
+            else:
+                logger.error(f"Failed to load {model_name}, skipping all files for this model")
+        
+        for file_idx, (input_file, num_tables) in enumerate(all_file_tables, 1):
+            logger.info("")
+            logger.info(f"Processing file {file_idx}/{len(all_file_tables)}: {Path(input_file).name}")
+            logger.info(f"  Tables in this file: {num_tables}")
+            
+            file_results = {model_name: [] for model_name in loaded_models}
+            active_models = list(loaded_models)
+            
+            for idx, table_data in enumerate(iter_tables_from_jsonl(input_file, max_tables), 1):
+                if not active_models:
+                    break
+                
+                table_id = table_data.get('table_id', 'unknown')
+                logger.info(f"  [{idx}/{num_tables}] Processing table: {table_id}")
+                
+                for model_name in list(active_models):
+                    logger.info(f"    Model: {model_name}")
+                    try:
+                        result = self.extract_kpis(
+                            table_data,
+                            model_name,
+                            max_correction_iterations
+                        )
+                        file_results[model_name].append(
+                            self._table_result_with_metadata(table_data, model_name, result)
+                        )
+                        
+                    except torch.cuda.OutOfMemoryError as e:
+                        logger.error(f"    CUDA OOM error on table {table_id}: {str(e)}")
+                        logger.error(f"    Stopping processing for {model_name} on this file")
+                        file_results[model_name].append({
+                            "table_id": table_data.get("table_id"),
+                            "model": model_name,
+                            "error": f"CUDA out of memory: {str(e)}"
+                        })
+                        active_models.remove(model_name)
+                        
+                    except Exception as e:
+                        logger.error(f"    Error processing table {table_id}: {str(e)}")
+                        file_results[model_name].append({
+                            "table_id": table_data.get("table_id"),
+                            "model": model_name,
+                            "error": str(e)
+                        })
+            
+            for model_name in loaded_models:
+                self._write_jsonl_results(
+                    output_path, input_file, model_name, file_results[model_name], timestamp, job_id
+                )
+        
+        logger.info(f"\n✓ All models completed all {len(all_file_tables)} files")
+        self.model_manager.unload_all_models()
+    
+    @staticmethod
+    def _table_result_with_metadata(
+        table_data: Dict[str, Any],
+        model_name: str,
+        result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Wrap an extraction result with the table metadata used in JSONL mode output."""
+        return {
+            "table_id": table_data.get("table_id"),
+            "doc_id": table_data.get("doc_id"),
+            "year": table_data.get("year"),
+            "section_name": table_data.get("section_name"),
+            "title": table_data.get("title"),
+            "extraction_timestamp": datetime.now().isoformat(),
+            "model": model_name,
+            "extraction_result": result
+        }
+    
+    def _write_jsonl_results(
+        self,
+        output_path: Path,
+        input_file: str,
+        model_name: str,
+        model_results: List[Dict[str, Any]],
+        timestamp: str,
+        job_id: Optional[str]
+    ) -> None:
+        """
+        Write the results of one model on one input file and log its statistics.
+        
+        Args:
+            output_path: Directory for output files
+            input_file: Input JSONL file the results belong to
+            model_name: Model that produced the results
+            model_results: Per-table results (with metadata)
+            timestamp: Run timestamp used in the filename
+            job_id: Optional SLURM job ID for filename
+        """
+        input_filename = Path(input_file).stem  # e.g., "linked_tables(2023)"
+        
+        # Create filename for this input file + model combination
+        if job_id:
+            output_filename = f"{job_id}_{timestamp}_{model_name}_{input_filename}.json"
+        else:
+            output_filename = f"kpis_{timestamp}_{model_name}_{input_filename}.json"
+        
+        output_file = output_path / output_filename
+        
+        # Write results to JSON file
+        logger.info(f"  Writing results to: {output_filename}")
+        
+        output_data = {
+            "metadata": {
+                "model": model_name,
+                "input_file": str(input_file),
+                "extraction_timestamp": datetime.now().isoformat(),
+                "num_tables_processed": len(model_results),
+                "job_id": job_id
+            },
+            "tables": model_results
+        }
+        
+        with open(output_file, 'w', encoding='utf-8') as f_out:
+            json.dump(output_data, f_out, ensure_ascii=False, indent=2)
+        
+        # Calculate statistics for this file
+        total_kpis = 0
+        successful = 0
+        failed = 0
+        
+        for result in model_results:
+            if "error" in result:
+                failed += 1
+            else:
+                successful += 1
+                extraction_result = result.get("extraction_result", {})
+                if "kpis" in extraction_result:
+                    total_kpis += len(extraction_result.get("kpis", []))
+        
+        logger.info(f"  ✓ Completed {Path(input_file).name} with {model_name}:")
+        logger.info(f"    - Tables: {len(model_results)}, Successful: {successful}, Failed: {failed}")
+        logger.info(f"    - KPIs extracted: {total_kpis}")
 
 
 # ============================================================================
@@ -9,9 +9,39 @@ Handles common issues like markdown formatting around JSON.
 
 import json
 import logging
+import re
+from typing import Optional
+
+try:
+    from json_repair import repair_json
+except ImportError:  # optional dependency, fall back to the bracket balancer below
+    repair_json = None
 
 logger = logging.getLogger(__name__)
 
+# Trailing commas before a closing bracket (common in truncated LLM output)
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+# How far back from the end to look for </think> first
+THINK_TAG_WINDOW = 8192
+
+# Outermost JSON object: first '{' through last '}'
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def _rfind_tail(text: str, sub: str, window: int) -> int:
+    """
+    rfind that only scans the tail of text, falling back to a full scan.
+    
+    A hit inside the tail window is by definition the last occurrence, so the
+    result is identical to text.rfind(sub) while long reasoning prefixes are
+    skipped in the common case.
+    """
+    pos = text.rfind(sub, max(0, len(text) - window))
+    if pos == -1 and len(text) > window:
+        pos = text.rfind(sub)
+    return pos
+
 
 def clean_json_response(text: str, remove_prompt: str = None) -> str:
     """
@@ -29,41 +59,19 @@ def clean_json_response(text: str, remove_prompt: str = None) -> str:
         Cleaned JSON string
     """
     # Find the LAST </think> tag - this marks the end of reasoning
-    last_think_end = text.rfind('</think>')
-    
-    if last_think_end != -1:
-        # Start searching for JSON AFTER the last </think> tag
-        search_start = last_think_end + len('</think>')
-        logger.info(f"    → Found </think> tag at position {last_think_end}, searching for JSON after that")
-    else:
-        # No <think> tags found, search from beginning
-        search_start = 0
-        logger.info(f"    → No </think> tags found, searching entire output for JSON")
-    
-    # Extract the text after the last </think> (or all text if no tags)
-    json_text = text[search_start:]
-    
-    # Find the first '{' character (start of JSON object)
-    first_brace = json_text.find('{')
-    if first_brace == -1:
-        logger.warning(f"    → No JSON object found in response (no '{{' character)")
-        return text  # Return as-is for error reporting
+    last_think_end = _rfind_tail(text, '</think>', THINK_TAG_WINDOW)
     
-    # Find the last '}' character (end of JSON object)
-    last_brace = json_text.rfind('}')
-    if last_brace == -1:
-        logger.warning(f"    → No closing brace found in response (no '}}' character)")
-        return text  # Return as-is for error reporting
+    # Search for JSON after the last </think> tag (or in all text if there is none)
+    search_start = 0 if last_think_end == -1 else last_think_end + len('</think>')
+    logger.debug(f"    → Searching for JSON from position {search_start}")
     
-    # Log what we're stripping
-    if first_brace > 0:
-        logger.info(f"    → Stripping {first_brace} characters before first '{{' character")
-    if last_brace < len(json_text) - 1:
-        extra_chars = len(json_text) - last_brace - 1
-        logger.info(f"    → Stripping {extra_chars} characters after last '}}' character")
+    # First '{' to last '}' in one scan of the post-think text
+    match = _JSON_OBJECT_RE.search(text, search_start)
+    if match is None:
+        logger.warning(f"    → No complete JSON object found in response")
+        return text  # Return as-is for error reporting
     
-    # Extract everything from first { to last } in the post-think text
-    return json_text[first_brace:last_brace + 1].strip()
+    return match.group(0)
 
 
 def parse_json_safely(text: str) -> dict:
@@ -82,3 +90,92 @@ def parse_json_safely(text: str) -> dict:
         logger.warning(f"    JSON parsing failed: {str(e)}")
         logger.warning(f"    Error at position {e.pos}")
         return None
+
+
+def _balance_json_prefix(text: str) -> Optional[str]:
+    """
+    Cut text back to the last fully closed object/array and close the rest.
+    
+    Walks the string once, tracking string/escape state and the stack of open
+    brackets. The longest prefix ending in a completed value is kept and the
+    brackets still open at that point are closed in reverse order.
+    
+    Args:
+        text: JSON text that may be truncated mid-value
+        
+    Returns:
+        Balanced JSON string, or None if no complete value was found
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    last_cut = -1
+    last_stack = None
+    
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if not stack or stack[-1] != ch:
+                break
+            stack.pop()
+            last_cut = i
+            last_stack = list(stack)
+            if not stack:
+                break
+    
+    if last_cut == -1:
+        return None
+    
+    prefix = text[:last_cut + 1]
+    return prefix + ''.join(reversed(last_stack))
+
+
+def repair_json_response(text: str) -> Optional[dict]:
+    """
+    Recover a parseable JSON object from truncated or slightly malformed output.
+    
+    Used before falling back to another LLM round-trip: the generation has
+    already been paid for, so salvaging the valid prefix of the KPI list is
+    much cheaper than regenerating it. Uses json_repair when it is installed,
+    otherwise strips trailing commas and balances open brackets.
+    
+    Args:
+        text: Cleaned model output that failed json.loads
+        
+    Returns:
+        Parsed dictionary, or None if the text could not be repaired
+    """
+    candidates = []
+    if repair_json is not None:
+        try:
+            candidates.append(repair_json(text))
+        except Exception as e:
+            logger.warning(f"    json_repair failed: {str(e)}")
+    
+    without_commas = _TRAILING_COMMA_RE.sub(r'\1', text)
+    candidates.append(without_commas)
+    balanced = _balance_json_prefix(without_commas)
+    if balanced is not None:
+        candidates.append(_TRAILING_COMMA_RE.sub(r'\1', balanced))
+    
+    for candidate in candidates:
+        try:
+            result = json.loads(candidate)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if isinstance(result, dict):
+            return result
+    
+    return None
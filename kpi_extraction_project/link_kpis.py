@@ -1,4 +1,10 @@
 import json
+import os
+import sys
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional
 import hashlib
@@ -8,6 +14,8 @@ class GraphNode:
     """
     Graph node representing a KPI with temporal links.
     
+    Uses __slots__ to keep per-node memory small on graphs with many nodes.
+    
     Attributes:
         kpi_id: Unique identifier for this KPI (hash-based)
         name: KPI metric name (e.g., "Sales", "Operating Cost")
@@ -15,19 +23,32 @@ class GraphNode:
         key: Entity/context (e.g., "Audi", "Core Brand Group")
         year: Temporal information
         units: Unit of measurement
+        row_idx, col_idx, row_name, col_name, table_id: Evidence (source cell) fields
         next: Link to next temporal KPI (same name+key, next year)
         prev: Link to previous temporal KPI (same name+key, previous year)
     """
     
+    __slots__ = (
+        "kpi_id", "name", "value", "key", "year", "units",
+        "row_idx", "col_idx", "row_name", "col_name", "table_id",
+        "next", "prev",
+    )
+    
     def __init__(self, kpi_id: str, name: str, value: float, key: str, year: int, 
-                 units: Optional[str] = None, **metadata):
+                 units: Optional[str] = None, row_idx: Optional[int] = None,
+                 col_idx: Optional[int] = None, row_name: Optional[str] = None,
+                 col_name: Optional[str] = None, table_id: Optional[str] = None):
         self.kpi_id = kpi_id
         self.name = name
         self.value = value
         self.key = key
         self.year = year
         self.units = units
-        self.metadata = metadata  # Store additional fields like row_idx, col_idx, etc.
+        self.row_idx = row_idx
+        self.col_idx = col_idx
+        self.row_name = row_name
+        self.col_name = col_name
+        self.table_id = table_id
         self.next = None
         self.prev = None
     
@@ -45,7 +66,67 @@ class GraphNode:
             "units": self.units,
             "next_kpi_id": self.next.kpi_id if self.next else None,
             "prev_kpi_id": self.prev.kpi_id if self.prev else None,
-            **self.metadata
+            "row_idx": self.row_idx,
+            "col_idx": self.col_idx,
+            "row_name": self.row_name,
+            "col_name": self.col_name,
+            "table_id": self.table_id
+        }
+
+
+# Distinct KPI composites above which ID hashing is spread over worker processes
+PARALLEL_HASH_THRESHOLD = 100_000
+PARALLEL_HASH_CHUNK = 20_000
+
+
+@dataclass
+class GraphStore:
+    """
+    Linked KPI graph with the temporal links also held as parallel index arrays.
+    
+    nodes keeps the GraphNode objects for serialization; next_idx/prev_idx hold
+    the position of each node's neighbour in nodes (-1 when unlinked) so chain
+    statistics scan two flat int arrays instead of chasing node pointers.
+    
+    Attributes:
+        nodes: GraphNode objects in first-seen order
+        next_idx: Index of each node's next-year node, or -1
+        prev_idx: Index of each node's previous-year node, or -1
+    """
+    nodes: List[GraphNode]
+    next_idx: array
+    prev_idx: array
+    
+    def __len__(self) -> int:
+        return len(self.nodes)
+    
+    def __iter__(self):
+        return iter(self.nodes)
+    
+    def to_dicts(self) -> List[Dict]:
+        """Convert all nodes to dictionaries for JSON serialization."""
+        return [node.to_dict() for node in self.nodes]
+    
+    def link_stats(self) -> Dict[str, int]:
+        """
+        Count linked nodes, chains and isolated nodes from the index arrays.
+        
+        Returns:
+            Dictionary with total, linked, chains and isolated counts
+        """
+        linked = 0
+        chains = 0
+        for nxt, prv in zip(self.next_idx, self.prev_idx):
+            if nxt >= 0 or prv >= 0:
+                linked += 1
+                if prv < 0:
+                    chains += 1
+        
+        return {
+            "total": len(self.nodes),
+            "linked": linked,
+            "chains": chains,
+            "isolated": len(self.nodes) - linked
         }
 
 
@@ -53,6 +134,9 @@ def generate_kpi_id(name: str, key: str, year: int, value: float) -> str:
     """
     Generate a unique KPI ID based on its attributes.
     
+    Goes through generate_kpi_ids, so single and batch IDs share one
+    composite format and hashing path.
+    
     Args:
         name: KPI metric name
         key: Entity/context
@@ -62,42 +146,74 @@ def generate_kpi_id(name: str, key: str, year: int, value: float) -> str:
     Returns:
         SHA256 hash as unique identifier
     """
-    composite = f"{name}|{key}|{year}|{value}"
-    return hashlib.sha256(composite.encode()).hexdigest()
+    return generate_kpi_ids([{"name": name, "key": key, "year": year, "value": value}])[0]
+
+
+def _hash_composites(composites: List[str]) -> List[str]:
+    """SHA256 hex digests of a list of composite strings (worker for generate_kpi_ids)."""
+    sha256 = hashlib.sha256
+    return [sha256(composite.encode()).hexdigest() for composite in composites]
+
+
+def generate_kpi_ids(kpis: List[Dict]) -> List[str]:
+    """
+    Generate KPI IDs for a whole batch of KPIs at once.
+    
+    Builds the composite strings in one comprehension and hashes each distinct
+    one once, avoiding a Python function call per KPI.
+    Large batches are hashed in chunks across worker processes (hashlib keeps
+    the GIL for inputs this short, so threads would not help).
+    
+    Args:
+        kpis: List of KPI dictionaries with name, key, year, value fields
+    
+    Returns:
+        List of SHA256 IDs, one per KPI in input order
+    """
+    composites = [
+        f"{kpi.get('name')}|{kpi.get('key')}|{kpi.get('year')}|{kpi.get('value')}"
+        for kpi in kpis
+    ]
+    
+    unique = list(dict.fromkeys(composites))
+    if len(unique) > PARALLEL_HASH_THRESHOLD and (os.cpu_count() or 1) > 1:
+        chunks = [unique[i:i + PARALLEL_HASH_CHUNK] for i in range(0, len(unique), PARALLEL_HASH_CHUNK)]
+        with ProcessPoolExecutor() as executor:
+            hashed = [digest for part in executor.map(_hash_composites, chunks) for digest in part]
+    else:
+        hashed = _hash_composites(unique)
+    
+    digests = dict(zip(unique, hashed))
+    return [digests[composite] for composite in composites]
 
 
-def link_kpis(kpis: List[Dict]) -> List[GraphNode]:
+def link_kpis(kpis: List[Dict]) -> GraphStore:
     """
     Create a temporal graph by linking KPIs across years.
     
     Logic:
         1. Group KPIs by (name, key) - same metric for same entity
-        2. Sort each group by year
-        3. Link consecutive years: node[i].next = node[i+1], node[i+1].prev = node[i]
-        4. Return list of all graph nodes
+        2. Sort all dated nodes by (group, year) in one stable sort
+        3. Link consecutive years within a group: node[i].next = node[i+1], node[i+1].prev = node[i]
+        4. Return all graph nodes with their links as index arrays
     
     Args:
         kpis: List of KPI dictionaries with name, key, year, value fields
     
     Returns:
-        List of GraphNode objects with temporal links established
+        GraphStore of GraphNode objects with temporal links established
     """
-    # Group KPIs by (name, key)
-    groups = {}
     nodes_map = {}  # kpi_id -> GraphNode
+    group_ids = {}  # (name, key) -> group index in first-seen order
+    dated_nodes = []  # (group index, node) for nodes with a year
+    
+    # Generate unique IDs for the whole batch up front
+    kpi_ids = generate_kpi_ids(kpis)
     
-    for kpi in kpis:
+    for kpi, kpi_id in zip(kpis, kpi_ids):
         # Extract evidence data if available
         evidence = kpi.get("evidence", {})
         
-        # Generate unique ID
-        kpi_id = generate_kpi_id(
-            kpi.get("name"),
-            kpi.get("key"),
-            kpi.get("year"),
-            kpi.get("value")
-        )
-        
         # Create graph node
         node = GraphNode(
             kpi_id=kpi_id,
@@ -115,35 +231,35 @@ def link_kpis(kpis: List[Dict]) -> List[GraphNode]:
         
         nodes_map[kpi_id] = node
         
-        # Group by (name, key)
-        group_key = (kpi.get("name", ""), kpi.get("key", ""))
-        if group_key not in groups:
-            groups[group_key] = []
-        groups[group_key].append(node)
-    
-    # Link nodes within each group by year
-    for group_key, group_nodes in groups.items():
-        # Filter out nodes with missing year and sort by year
-        valid_nodes = [n for n in group_nodes if n.year is not None]
-        valid_nodes.sort(key=lambda n: n.year)
-        
-        # Link consecutive years
-        for i in range(len(valid_nodes) - 1):
-            current = valid_nodes[i]
-            next_node = valid_nodes[i + 1]
-            
+        # Nodes with missing year are never linked
+        if node.year is not None:
+            group_key = (kpi.get("name", ""), kpi.get("key", ""))
+            group_idx = group_ids.setdefault(group_key, len(group_ids))
+            dated_nodes.append((group_idx, node))
+    
+    # One stable sort by (group, year) instead of a sort per group
+    dated_nodes.sort(key=lambda item: (item[0], item[1].year))
+    
+    # Link consecutive years within the same (name, key) group
+    for (group_idx, current), (next_group_idx, next_node) in zip(dated_nodes, dated_nodes[1:]):
+        if group_idx == next_group_idx:
             current.next = next_node
             next_node.prev = current
     
-    return list(nodes_map.values())
+    nodes = list(nodes_map.values())
+    index_of = {node.kpi_id: idx for idx, node in enumerate(nodes)}
+    next_idx = array('l', [index_of[n.next.kpi_id] if n.next else -1 for n in nodes])
+    prev_idx = array('l', [index_of[n.prev.kpi_id] if n.prev else -1 for n in nodes])
+    
+    return GraphStore(nodes=nodes, next_idx=next_idx, prev_idx=prev_idx)
 
 
-def save_graph(nodes: List[GraphNode], output_path: Path):
+def save_graph(nodes: GraphStore, output_path: Path):
     """
     Save the KPI graph to JSON format.
     
     Args:
-        nodes: List of GraphNode objects
+        nodes: GraphStore returned by link_kpis
         output_path: Path to save the JSON file
     """
     # Create output directory if it doesn't exist
@@ -151,7 +267,7 @@ def save_graph(nodes: List[GraphNode], output_path: Path):
     
     graph_data = {
         "total_nodes": len(nodes),
-        "nodes": [node.to_dict() for node in nodes]
+        "nodes": nodes.to_dicts()
     }
     
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -187,109 +303,124 @@ def analyze_grouping_strategies(all_kpis: List[Dict]):
     Args:
         all_kpis: List of all valid KPI dictionaries
     """
-    print("\n" + "="*80)
-    print("GROUPING STRATEGY ANALYSIS")
-    print("="*80)
+    # Build all three groupings (and their year sets) in a single pass
+    groups_by_name = defaultdict(list)
+    groups_by_name_key = defaultdict(list)
+    groups_by_name_key_units = defaultdict(list)
+    years_by_name = defaultdict(set)
+    years_by_name_key = defaultdict(set)
+    years_by_name_key_units = defaultdict(set)
     
-    # Strategy 1: Group by NAME only
-    print("\n" + "-"*80)
-    print("STRATEGY 1: GROUP BY NAME ONLY")
-    print("-"*80)
-    groups_by_name = {}
     for kpi in all_kpis:
         name = kpi.get("name", "")
-        if name not in groups_by_name:
-            groups_by_name[name] = []
+        key = kpi.get("key", "")
+        units = kpi.get("units")
+        year = kpi.get("year")
+        
         groups_by_name[name].append(kpi)
+        groups_by_name_key[(name, key)].append(kpi)
+        groups_by_name_key_units[(name, key, units)].append(kpi)
+        
+        if year is not None:
+            years_by_name[name].add(year)
+            years_by_name_key[(name, key)].add(year)
+            years_by_name_key_units[(name, key, units)].add(year)
+    
+    groups_by_name = dict(groups_by_name)
+    groups_by_name_key = dict(groups_by_name_key)
+    groups_by_name_key_units = dict(groups_by_name_key_units)
+    
+    # Collect the report and write it once instead of one print per line
+    lines = []
+    out = lines.append
     
-    print(f"\nTotal groups: {len(groups_by_name)}")
-    print(f"\nTop 10 groups by size:")
+    out("\n" + "="*80)
+    out("GROUPING STRATEGY ANALYSIS")
+    out("="*80)
+    
+    # Strategy 1: Group by NAME only
+    out("\n" + "-"*80)
+    out("STRATEGY 1: GROUP BY NAME ONLY")
+    out("-"*80)
+    
+    out(f"\nTotal groups: {len(groups_by_name)}")
+    out(f"\nTop 10 groups by size:")
     sorted_by_name = sorted(groups_by_name.items(), key=lambda x: len(x[1]), reverse=True)
     for i, (name, kpis) in enumerate(sorted_by_name[:10], 1):
-        years = sorted(set(k.get("year") for k in kpis if k.get("year") is not None))
+        years = sorted(years_by_name[name])
         unique_keys = set(k.get("key") for k in kpis)
         unique_units = set(k.get("units") for k in kpis)
-        print(f"\n{i}. Name: '{name}'")
-        print(f"   Total KPIs: {len(kpis)}")
-        print(f"   Years: {years}")
-        print(f"   Unique Keys: {len(unique_keys)} - {list(unique_keys)[:3]}{'...' if len(unique_keys) > 3 else ''}")
-        print(f"   Unique Units: {unique_units}")
+        out(f"\n{i}. Name: '{name}'")
+        out(f"   Total KPIs: {len(kpis)}")
+        out(f"   Years: {years}")
+        out(f"   Unique Keys: {len(unique_keys)} - {list(unique_keys)[:3]}{'...' if len(unique_keys) > 3 else ''}")
+        out(f"   Unique Units: {unique_units}")
     
     # Strategy 2: Group by (NAME, KEY)
-    print("\n" + "-"*80)
-    print("STRATEGY 2: GROUP BY (NAME, KEY)")
-    print("-"*80)
-    groups_by_name_key = {}
-    for kpi in all_kpis:
-        group_key = (kpi.get("name", ""), kpi.get("key", ""))
-        if group_key not in groups_by_name_key:
-            groups_by_name_key[group_key] = []
-        groups_by_name_key[group_key].append(kpi)
+    out("\n" + "-"*80)
+    out("STRATEGY 2: GROUP BY (NAME, KEY)")
+    out("-"*80)
     
-    print(f"\nTotal groups: {len(groups_by_name_key)}")
-    print(f"\nTop 10 groups by size:")
+    out(f"\nTotal groups: {len(groups_by_name_key)}")
+    out(f"\nTop 10 groups by size:")
     sorted_by_name_key = sorted(groups_by_name_key.items(), key=lambda x: len(x[1]), reverse=True)
     for i, ((name, key), kpis) in enumerate(sorted_by_name_key[:10], 1):
-        years = sorted(set(k.get("year") for k in kpis if k.get("year") is not None))
+        years = sorted(years_by_name_key[(name, key)])
         unique_units = set(k.get("units") for k in kpis)
         values = [k.get("value") for k in sorted(kpis, key=lambda x: x.get("year") or 0)]
-        print(f"\n{i}. Name: '{name}' | Key: '{key}'")
-        print(f"   Total KPIs: {len(kpis)}")
-        print(f"   Years: {years}")
-        print(f"   Unique Units: {unique_units}")
-        print(f"   Value progression: {values}")
+        out(f"\n{i}. Name: '{name}' | Key: '{key}'")
+        out(f"   Total KPIs: {len(kpis)}")
+        out(f"   Years: {years}")
+        out(f"   Unique Units: {unique_units}")
+        out(f"   Value progression: {values}")
     
     # Strategy 3: Group by (NAME, KEY, UNITS)
-    print("\n" + "-"*80)
-    print("STRATEGY 3: GROUP BY (NAME, KEY, UNITS)")
-    print("-"*80)
-    groups_by_name_key_units = {}
-    for kpi in all_kpis:
-        group_key = (kpi.get("name", ""), kpi.get("key", ""), kpi.get("units"))
-        if group_key not in groups_by_name_key_units:
-            groups_by_name_key_units[group_key] = []
-        groups_by_name_key_units[group_key].append(kpi)
+    out("\n" + "-"*80)
+    out("STRATEGY 3: GROUP BY (NAME, KEY, UNITS)")
+    out("-"*80)
     
-    print(f"\nTotal groups: {len(groups_by_name_key_units)}")
-    print(f"\nTop 10 groups by size:")
+    out(f"\nTotal groups: {len(groups_by_name_key_units)}")
+    out(f"\nTop 10 groups by size:")
     sorted_by_name_key_units = sorted(groups_by_name_key_units.items(), key=lambda x: len(x[1]), reverse=True)
     for i, ((name, key, units), kpis) in enumerate(sorted_by_name_key_units[:10], 1):
-        years = sorted(set(k.get("year") for k in kpis if k.get("year") is not None))
+        years = sorted(years_by_name_key_units[(name, key, units)])
         values = [k.get("value") for k in sorted(kpis, key=lambda x: x.get("year") or 0)]
-        print(f"\n{i}. Name: '{name}' | Key: '{key}' | Units: '{units}'")
-        print(f"   Total KPIs: {len(kpis)}")
-        print(f"   Years: {years}")
-        print(f"   Value progression: {values}")
+        out(f"\n{i}. Name: '{name}' | Key: '{key}' | Units: '{units}'")
+        out(f"   Total KPIs: {len(kpis)}")
+        out(f"   Years: {years}")
+        out(f"   Value progression: {values}")
     
     # Summary statistics
-    print("\n" + "="*80)
-    print("SUMMARY COMPARISON")
-    print("="*80)
+    out("\n" + "="*80)
+    out("SUMMARY COMPARISON")
+    out("="*80)
+    
+    # Count groups with temporal coverage from the year sets built above
+    def count_temporal_groups(years_dict, min_years=2):
+        return sum(1 for years in years_dict.values() if len(years) >= min_years)
     
-    # Count groups with temporal coverage
-    def count_temporal_groups(groups_dict, min_years=2):
-        return sum(1 for kpis in groups_dict.values() if len(set(k.get("year") for k in kpis if k.get("year") is not None)) >= min_years)
+    temporal_name = count_temporal_groups(years_by_name)
+    temporal_name_key = count_temporal_groups(years_by_name_key)
+    temporal_name_key_units = count_temporal_groups(years_by_name_key_units)
     
-    temporal_name = count_temporal_groups(groups_by_name)
-    temporal_name_key = count_temporal_groups(groups_by_name_key)
-    temporal_name_key_units = count_temporal_groups(groups_by_name_key_units)
+    out(f"\nStrategy 1 (NAME only):")
+    out(f"  Total groups: {len(groups_by_name)}")
+    out(f"  Groups with 2+ years: {temporal_name}")
+    out(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name):.1f}")
     
-    print(f"\nStrategy 1 (NAME only):")
-    print(f"  Total groups: {len(groups_by_name)}")
-    print(f"  Groups with 2+ years: {temporal_name}")
-    print(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name):.1f}")
+    out(f"\nStrategy 2 (NAME + KEY):")
+    out(f"  Total groups: {len(groups_by_name_key)}")
+    out(f"  Groups with 2+ years: {temporal_name_key}")
+    out(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name_key):.1f}")
     
-    print(f"\nStrategy 2 (NAME + KEY):")
-    print(f"  Total groups: {len(groups_by_name_key)}")
-    print(f"  Groups with 2+ years: {temporal_name_key}")
-    print(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name_key):.1f}")
+    out(f"\nStrategy 3 (NAME + KEY + UNITS):")
+    out(f"  Total groups: {len(groups_by_name_key_units)}")
+    out(f"  Groups with 2+ years: {temporal_name_key_units}")
+    out(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name_key_units):.1f}")
     
-    print(f"\nStrategy 3 (NAME + KEY + UNITS):")
-    print(f"  Total groups: {len(groups_by_name_key_units)}")
-    print(f"  Groups with 2+ years: {temporal_name_key_units}")
-    print(f"  Average KPIs per group: {len(all_kpis)/len(groups_by_name_key_units):.1f}")
+    out("\n" + "="*80)
     
-    print("\n" + "="*80)
+    sys.stdout.write("\n".join(lines) + "\n")
     
     return {
         "by_name": groups_by_name,
@@ -323,15 +454,13 @@ def main():
     nodes = link_kpis(all_kpis)
     
     # Calculate statistics
-    linked_nodes = sum(1 for n in nodes if n.next or n.prev)
-    chain_starts = sum(1 for n in nodes if n.prev is None and n.next is not None)
-    isolated_nodes = sum(1 for n in nodes if n.next is None and n.prev is None)
+    stats = nodes.link_stats()
     
     print(f"\nLinking Statistics:")
-    print(f"  Total nodes: {len(nodes)}")
-    print(f"  Linked nodes: {linked_nodes}")
-    print(f"  Temporal chains: {chain_starts}")
-    print(f"  Isolated nodes: {isolated_nodes}")
+    print(f"  Total nodes: {stats['total']}")
+    print(f"  Linked nodes: {stats['linked']}")
+    print(f"  Temporal chains: {stats['chains']}")
+    print(f"  Isolated nodes: {stats['isolated']}")
     
     # Save links to JSON file
     output_file = output_dir / 'links.json'
@@ -3,12 +3,99 @@ Database loader utilities for KPI extraction.
 """
 
 import json
+import os
 import sqlite3
-from typing import Dict, List, Any, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, Any, Iterator, Optional
 from pathlib import Path
-from datetime import datetime
 from logger import logger
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # optional dependency, stdlib decoder is a drop-in fallback
+    orjson = None
+    _json_loads = json.loads
+
+try:
+    import simdjson
+except ImportError:  # optional dependency, lets resume read table_id without a full decode
+    simdjson = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc as pa_ipc
+except ImportError:  # optional dependency, enables the rows_arrow column
+    pa = None
+    pa_ipc = None
+
+# table_id starts with a two-letter company code followed by the year (e.g., VW2019_T4e9153)
+_YEAR_PREFIX_CONDITION = (
+    "substr(table_id, 1, 2) GLOB '[A-Za-z][A-Za-z]' "
+    "AND substr(table_id, 3, 4) GLOB '[0-9][0-9][0-9][0-9]'"
+)
+
+
+@lru_cache(maxsize=4)
+def _connect(db_path: str) -> sqlite3.Connection:
+    """
+    Return the shared connection for a database, opening it on first use.
+    
+    The connection is cached per path and kept open, so the loaders share one
+    warm page cache instead of reconnecting on every call. On first open the
+    database is switched to WAL and the index on substr(table_id, 3, 4) is
+    created, which lets SQLite answer year filters with a B-tree search
+    instead of a full scan. Both need write access; on a read-only database
+    the loaders simply fall back to scanning. The connection is then made
+    query-only.
+    
+    Args:
+        db_path: Path to the SQLite database
+        
+    Returns:
+        Open connection (do not close it)
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ctxpacks_year "
+            "ON context_packs(substr(table_id, 3, 4))"
+        )
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Could not create year index on {db_path}: {e}")
+    
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+@lru_cache(maxsize=4)
+def _has_arrow_rows(db_path: str) -> bool:
+    """Whether rows can be read from the Arrow IPC rows_arrow column."""
+    if pa is None:
+        return False
+    columns = _connect(db_path).execute("PRAGMA table_info(context_packs)").fetchall()
+    return any(column[1] == "rows_arrow" for column in columns)
+
+
+def _encode_arrow_rows(rows: List[List[str]]) -> bytes:
+    """Serialize table rows (list of cell lists) as an Arrow IPC stream."""
+    table = pa.table({"cells": pa.array(rows, type=pa.list_(pa.string()))})
+    sink = pa.BufferOutputStream()
+    with pa_ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _decode_arrow_rows(blob: bytes) -> List[List[str]]:
+    """Read table rows back from an Arrow IPC stream without copying the blob."""
+    return pa_ipc.open_stream(pa.py_buffer(blob)).read_all().column("cells").to_pylist()
+
 
 def load_tables_from_db(
     db_path: str,
@@ -30,46 +117,100 @@ def load_tables_from_db(
     if year_filter:
         logger.info(f"  Year filter: {year_filter}")
     
-    conn = sqlite3.connect(db_path)
+    cur = _connect(db_path).cursor()
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT table_id, section_name, title, headers, merged_headers, rows, stub_col FROM context_packs")
+        # When rows_arrow is available the JSON rows text is only read for tables
+        # that have not been migrated yet.
+        use_arrow = _has_arrow_rows(db_path)
+        if use_arrow:
+            rows_columns = "CASE WHEN rows_arrow IS NULL THEN rows END AS rows, rows_arrow"
+        else:
+            rows_columns = "rows, NULL AS rows_arrow"
+        query = (
+            "SELECT table_id, COALESCE(section_name, ''), COALESCE(title, ''), headers, merged_headers, "
+            f"{rows_columns}, stub_col FROM context_packs"
+        )
+        params = {}
+        
+        # Year filter (e.g., VW2019_T4e9153 -> 2019) and limit are applied by SQLite.
+        # Each clause is only added when requested, so the expression index is used
+        # for year filters and SQLite stops reading pages once the limit is reached.
+        if year_filter:
+            query += " WHERE substr(table_id, 3, 4) = :yf"
+            params["yf"] = year_filter
+        if max_tables:
+            query += " LIMIT :lim"
+            params["lim"] = max_tables
+        cur.execute(query, params)
         
         tables = []
-        for row in cur.fetchall():
-            table_id, section_name, title, headers, merged_headers, rows, stub_col = row
+        # Iterate the cursor so SQLite steps one row at a time and each raw blob
+        # can be freed as soon as it has been decoded
+        for row in cur:
+            table_id, section_name, title, headers, merged_headers, rows, rows_arrow, stub_col = row
             
-            # Apply year filter if specified
-            if year_filter:
-                # Extract year from table_id (e.g., VW2019_T4e9153 -> 2019)
-                parts = table_id.split('_')
-                if parts:
-                    prefix = parts[0]
-                    if len(prefix) >= 6:
-                        table_year = prefix[2:6]
-                        if table_year != year_filter:
-                            continue
+            if rows_arrow is not None:
+                table_rows = _decode_arrow_rows(rows_arrow)
+            else:
+                table_rows = _json_loads(rows) if rows else []
             
             table_data = {
                 "table_id": table_id,
-                "section_name": section_name if section_name else "",
-                "title": title if title else "",
-                "headers": json.loads(headers) if headers else [],
-                "merged_headers": json.loads(merged_headers) if merged_headers else None,
-                "rows": json.loads(rows) if rows else [],
-                "stub_col": json.loads(stub_col) if stub_col else None,
+                "section_name": section_name,
+                "title": title,
+                "headers": _json_loads(headers) if headers else [],
+                "merged_headers": _json_loads(merged_headers) if merged_headers else None,
+                "rows": table_rows,
+                "stub_col": _json_loads(stub_col) if stub_col else None,
             }
             tables.append(table_data)
-            
-            # Check if we've hit the limit
-            if max_tables and len(tables) >= max_tables:
-                break
         
         logger.info(f"  Loaded {len(tables)} tables from database")
         return tables
         
+    finally:
+        cur.close()
+
+
+def migrate_rows_to_arrow(db_path: str) -> int:
+    """
+    Store every table's rows as an Arrow IPC blob in a rows_arrow column.
+    
+    The JSON rows column is left in place for other readers; once rows_arrow
+    is filled, load_tables_from_db reads it instead and skips the JSON decode.
+    Requires pyarrow and write access to the database.
+    
+    Args:
+        db_path: Path to the SQLite database
+        
+    Returns:
+        Number of tables migrated
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to migrate rows to Arrow")
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        columns = [column[1] for column in conn.execute("PRAGMA table_info(context_packs)")]
+        if "rows_arrow" not in columns:
+            conn.execute("ALTER TABLE context_packs ADD COLUMN rows_arrow BLOB")
+        
+        pending = conn.execute(
+            "SELECT table_id, rows FROM context_packs WHERE rows_arrow IS NULL AND rows IS NOT NULL"
+        ).fetchall()
+        for table_id, rows in pending:
+            conn.execute(
+                "UPDATE context_packs SET rows_arrow = ? WHERE table_id = ?",
+                (_encode_arrow_rows(_json_loads(rows)), table_id)
+            )
+        conn.commit()
+        
     finally:
         conn.close()
+    
+    _has_arrow_rows.cache_clear()
+    logger.info(f"Migrated rows of {len(pending)} tables to Arrow in {db_path}")
+    return len(pending)
 
 
 def get_years_from_db(db_path: str) -> List[str]:
@@ -82,26 +223,17 @@ def get_years_from_db(db_path: str) -> List[str]:
     Returns:
         List of year strings (e.g., ["2015", "2016", "2019"])
     """
-    conn = sqlite3.connect(db_path)
+    cur = _connect(db_path).cursor()
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT table_id FROM context_packs")
-        
-        years = set()
-        for row in cur.fetchall():
-            table_id = row[0]
-            parts = table_id.split('_')
-            if parts:
-                prefix = parts[0]
-                if len(prefix) >= 6 and prefix[:2].isalpha():
-                    year = prefix[2:6]
-                    if year.isdigit():
-                        years.add(year)
-        
-        return sorted(list(years))
+        cur.execute(
+            "SELECT DISTINCT substr(table_id, 3, 4) AS year FROM context_packs "
+            f"WHERE {_YEAR_PREFIX_CONDITION} "
+            "ORDER BY year"
+        )
+        return [row[0] for row in cur]
         
     finally:
-        conn.close()
+        cur.close()
 
 
 def get_table_count_by_year(db_path: str) -> Dict[str, int]:
@@ -114,88 +246,220 @@ def get_table_count_by_year(db_path: str) -> Dict[str, int]:
     Returns:
         Dictionary mapping year to table count
     """
-    conn = sqlite3.connect(db_path)
+    cur = _connect(db_path).cursor()
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT table_id FROM context_packs")
-        
-        year_counts = {}
-        for row in cur.fetchall():
-            table_id = row[0]
-            parts = table_id.split('_')
-            if parts:
-                prefix = parts[0]
-                if len(prefix) >= 6 and prefix[:2].isalpha():
-                    year = prefix[2:6]
-                    if year.isdigit():
-                        year_counts[year] = year_counts.get(year, 0) + 1
-        
-        return year_counts
+        cur.execute(
+            "SELECT substr(table_id, 3, 4) AS year, COUNT(*) FROM context_packs "
+            f"WHERE {_YEAR_PREFIX_CONDITION} "
+            "GROUP BY year"
+        )
+        return dict(cur)
         
     finally:
-        conn.close()
+        cur.close()
 
 
-def load_existing_results(output_file: Path) -> Tuple[List[Dict[str, Any]], set]:
+def count_jsonl_tables(jsonl_path: str, max_tables: Optional[int] = None) -> int:
     """
-    Load existing results from checkpoint file.
+    Count the tables in a JSONL file without decoding them.
     
     Args:
-        output_file: Path to output JSON file
+        jsonl_path: Path to the JSONL file
+        max_tables: Optional cap applied to the count
         
     Returns:
-        Tuple of (existing_results_list, set_of_processed_table_ids)
+        Number of non-empty lines (capped at max_tables)
     """
-    if not output_file.exists():
-        return [], set()
+    with open(jsonl_path, 'rb') as f:
+        count = sum(1 for line in f if line.strip())
     
-    try:
-        with open(output_file, 'r', encoding='utf-8') as f:
-            existing_data = json.load(f)
+    if max_tables:
+        return min(count, max_tables)
+    return count
+
+
+def iter_tables_from_jsonl(
+    jsonl_path: str,
+    max_tables: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream tables from a JSONL file, decoding one line at a time.
+    
+    Only the table currently being processed is held in memory, so the file
+    is simply re-opened whenever another model needs to process it.
+    
+    Args:
+        jsonl_path: Path to the JSONL file
+        max_tables: Maximum number of tables to yield
         
-        if isinstance(existing_data, list):
-            results = existing_data
-        elif isinstance(existing_data, dict) and 'results' in existing_data:
-            results = existing_data['results']
-        else:
-            logger.warning(f"Unexpected format in {output_file}, starting fresh")
-            return [], set()
+    Yields:
+        Table dictionaries
+    """
+    loaded = 0
+    with open(jsonl_path, 'rb') as f:
+        for line_num, line in enumerate(f, 1):
+            if max_tables and loaded >= max_tables:
+                break
+            if not line.strip():
+                continue
+            
+            try:
+                table_data = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f"    Invalid JSON on line {line_num} of {Path(jsonl_path).name}: {str(e)}")
+                continue
+            
+            loaded += 1
+            yield table_data
+
+
+def _iter_checkpoint_lines(output_file: Path) -> Iterator[bytes]:
+    """
+    Yield the complete, non-empty lines of a JSONL checkpoint.
+    
+    A truncated last line from an interrupted append is removed from the file
+    once iteration finishes, so the next append starts on a fresh line.
+    
+    Args:
+        output_file: Path to the JSONL checkpoint file
         
-        processed_ids = {r.get('table_id') for r in results if r.get('table_id')}
-        logger.info(f"  Found {len(processed_ids)} already processed tables in checkpoint file")
-        return results, processed_ids
+    Yields:
+        Raw line bytes
+    """
+    complete_bytes = 0
+    with open(output_file, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            complete_bytes += len(line)
+            if line.strip():
+                yield line
+    
+    if complete_bytes < output_file.stat().st_size:
+        logger.warning(f"  Truncating incomplete last line of {output_file.name}")
+        with open(output_file, 'r+b') as f:
+            f.truncate(complete_bytes)
+
+
+def iter_checkpoint_results(output_file: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the results stored in a JSONL checkpoint.
+    
+    Args:
+        output_file: Path to the JSONL checkpoint file
         
-    except Exception as e:
-        logger.warning(f"Error loading checkpoint file: {e}, starting fresh")
-        return [], set()
+    Yields:
+        Result dictionaries, skipping unreadable lines
+    """
+    for line in _iter_checkpoint_lines(output_file):
+        try:
+            yield _json_loads(line)
+        except ValueError as e:
+            logger.warning(f"  Skipping unreadable checkpoint line in {output_file.name}: {e}")
 
 
-def save_checkpoint(output_file: Path, results: List[Dict[str, Any]], 
-                   model_name: str, year_filter: Optional[str]) -> None:
+def load_processed_ids(output_file: Path) -> set:
     """
-    Save current results to checkpoint file.
+    Collect the table_ids already present in a JSONL checkpoint.
+    
+    Resuming only needs the ids, so the results themselves are not kept.
+    With simdjson installed only the table_id field of each line is
+    materialized; otherwise each line is decoded and dropped right away.
     
     Args:
-        output_file: Path to output JSON file
-        results: List of results to save
-        model_name: Model name for metadata
-        year_filter: Year filter for metadata
-    """
-    checkpoint_data = {
-        "metadata": {
-            "model": model_name,
-            "year_filter": year_filter,
-            "last_updated": datetime.now().isoformat(),
-            "total_tables_processed": len(results),
-            "checkpoint": True
-        },
-        "results": results
-    }
-    
-    # Write to temporary file first, then rename (atomic operation)
-    temp_file = output_file.with_suffix('.tmp')
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, indent=2, ensure_ascii=False)
-    
-    # Atomic rename
-    temp_file.replace(output_file)
+        output_file: Path to the JSONL checkpoint file
+        
+    Returns:
+        Set of processed table ids
+    """
+    if not output_file.exists():
+        return set()
+    
+    processed_ids = set()
+    parser = simdjson.Parser() if simdjson is not None else None
+    for line in _iter_checkpoint_lines(output_file):
+        try:
+            if parser is not None:
+                table_id = parser.parse(line).get('table_id')
+            else:
+                table_id = _json_loads(line).get('table_id')
+        except ValueError as e:
+            logger.warning(f"  Skipping unreadable checkpoint line in {output_file.name}: {e}")
+            continue
+        if table_id:
+            processed_ids.add(table_id)
+    
+    logger.info(f"  Found {len(processed_ids)} already processed tables in checkpoint file")
+    return processed_ids
+
+
+def convert_legacy_checkpoint(json_file: Path) -> Optional[Path]:
+    """
+    Convert a legacy JSON checkpoint into a JSONL checkpoint next to it.
+    
+    Older runs rewrote the whole checkpoint as one JSON document (a list, or
+    a dict with a 'results' key). The results are appended to a .jsonl file
+    of the same name, which then replaces the legacy file, so a resumed run
+    keeps the tables it had already processed. The legacy file's mtime is
+    carried over, so the most-recent-checkpoint choice is unchanged.
+    
+    Args:
+        json_file: Path to the legacy .json checkpoint
+        
+    Returns:
+        Path of the JSONL checkpoint, or None if the legacy file could not
+        be read or a .jsonl of the same name exists (it is then left in place)
+    """
+    jsonl_file = json_file.with_suffix('.jsonl')
+    if jsonl_file.exists():
+        logger.warning(f"  {jsonl_file.name} already exists, leaving legacy checkpoint {json_file.name} unconverted")
+        return None
+    
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            existing_data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"  Could not read legacy checkpoint {json_file.name}: {e}")
+        return None
+    
+    if isinstance(existing_data, list):
+        results = existing_data
+    elif isinstance(existing_data, dict) and 'results' in existing_data:
+        results = existing_data['results']
+    else:
+        logger.warning(f"  Unexpected format in legacy checkpoint {json_file.name}, leaving it in place")
+        return None
+    
+    tmp_file = jsonl_file.with_name(jsonl_file.name + '.tmp')
+    tmp_file.unlink(missing_ok=True)
+    for result in results:
+        append_result(tmp_file, result)
+    tmp_file.touch()
+    
+    mtime = json_file.stat().st_mtime
+    tmp_file.replace(jsonl_file)
+    os.utime(jsonl_file, (mtime, mtime))
+    json_file.unlink()
+    
+    logger.info(f"  Converted legacy checkpoint {json_file.name} → {jsonl_file.name} ({len(results)} results)")
+    return jsonl_file
+
+
+def append_result(output_file: Path, result: Dict[str, Any]) -> None:
+    """
+    Append one result to a JSONL checkpoint file.
+    
+    Each processed table costs a single appended line instead of rewriting
+    every result collected so far.
+    
+    Args:
+        output_file: Path to the JSONL checkpoint file
+        result: Result to append
+    """
+    if orjson is not None:
+        line = orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        line = (json.dumps(result, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+    
+    with open(output_file, 'ab') as f:
+        f.write(line)
@@ -1,10 +1,50 @@
+import copy
+import gc
+import hashlib
+import json
+import logging
+import os
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Expandable segments keep repeated load/unload cycles of large models from
+# fragmenting the CUDA caching allocator. Must be set before CUDA initializes;
+# run_kpi_extraction.sh exports the same value, which takes precedence.
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
+# Let the Rust tokenizers backend encode batches on several threads
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    BitsAndBytesConfig,
+    StaticCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
 from logger import logger
 
 # Base path for shared model weights on the UKP cluster
 SHARED_MODELS_BASE = "/storage/ukp/shared/shared_model_weights"
 
+# Fraction of free GPU memory that co-resident models may occupy
+CO_RESIDENCE_MEMORY_FRACTION = 0.85
+
+# Default cap on each device's memory this process may allocate
+# (per model: "per_process_memory_fraction" in its config)
+PER_PROCESS_MEMORY_FRACTION = 0.95
+
+# Number of prompt prefixes whose KV cache is kept (per process, across models)
+PREFIX_CACHE_SIZE = 2
+
+# Where resolved device maps are stored between runs
+DEVICE_MAP_CACHE_DIR = Path.home() / ".cache" / "kpi_extraction" / "device_maps"
+
 MODEL_CONFIGS = {
     # ...existing configs...
     "deepseek-r1-distill-llama-70b": {
@@ -12,19 +52,299 @@ MODEL_CONFIGS = {
         "includes_prompt_in_output": True,
         "description": "DeepSeek R1 Distill Llama 70B - Distilled reasoning model based on Llama architecture",
         "max_new_tokens": 16384,
-        "max_memory": {0: "75GB", 1: "75GB"}
+        "max_memory": {0: "75GB", 1: "75GB"},
+        "estimated_gb": 142,
+        "think_tags": True
     },
     # ...other configs...
 }
 
+THINK_END_TAG = "</think>"
+
+
+def prefetch_checkpoint(model_path: str) -> int:
+    """
+    Ask the kernel to start reading all safetensors shards of a checkpoint.
+
+    from_pretrained memory-maps the shards and faults pages in tensor by
+    tensor, which leaves shared/network storage mostly idle. Issuing
+    POSIX_FADV_WILLNEED up front lets readahead stream every shard in the
+    background while the model skeleton is being built.
+
+    Args:
+        model_path: Model directory (or HF cache directory) containing the shards
+
+    Returns:
+        Number of bytes scheduled for readahead
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return 0
+
+    scheduled = 0
+    for shard in Path(model_path).rglob("*.safetensors"):
+        try:
+            fd = os.open(shard, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            scheduled += os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+    return scheduled
+
+
+# torch.nn.init functions that module constructors use to fill fresh weights
+_INIT_FUNCTIONS = (
+    "uniform_", "normal_", "trunc_normal_", "constant_", "zeros_", "ones_",
+    "kaiming_uniform_", "kaiming_normal_", "xavier_uniform_", "xavier_normal_",
+)
+
+
+@contextmanager
+def skip_weight_init():
+    """
+    Turn torch.nn.init functions into no-ops while a model is being built.
+
+    Every weight is overwritten by the checkpoint right after construction,
+    so the random initialization is wasted work (and memory traffic) on
+    large models. The original functions are restored on exit.
+    """
+    originals = {name: getattr(torch.nn.init, name) for name in _INIT_FUNCTIONS}
+    for name in _INIT_FUNCTIONS:
+        setattr(torch.nn.init, name, lambda tensor, *args, **kwargs: tensor)
+    try:
+        yield
+    finally:
+        for name, function in originals.items():
+            setattr(torch.nn.init, name, function)
+
+
+def _device_map_cache_file(model_name: str, max_memory: Optional[Dict], quantization: Optional[str]) -> Path:
+    """Cache file for a model's device map under a given memory limit and GPU set."""
+    devices = []
+    if torch.cuda.is_available():
+        devices = [
+            (torch.cuda.get_device_name(d), torch.cuda.get_device_properties(d).total_memory)
+            for d in range(torch.cuda.device_count())
+        ]
+    key = json.dumps(
+        {"max_memory": max_memory, "quantization": quantization, "devices": devices},
+        sort_keys=True,
+        default=str
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return DEVICE_MAP_CACHE_DIR / f"{model_name}-{digest}.json"
+
+
+def load_cached_device_map(model_name: str, max_memory: Optional[Dict], quantization: Optional[str]):
+    """
+    Return the device map stored by a previous load with the same settings.
+
+    Args:
+        model_name: Model name from MODEL_CONFIGS
+        max_memory: Memory limits passed to from_pretrained
+        quantization: Quantization mode from the config (or None)
+
+    Returns:
+        Device map dict, or "auto" if none is cached yet
+    """
+    cache_file = _device_map_cache_file(model_name, max_memory, quantization)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return "auto"
+
+
+def save_device_map(model_name: str, max_memory: Optional[Dict], quantization: Optional[str],
+                    device_map: Dict) -> None:
+    """
+    Store the device map accelerate resolved for a model so later loads skip the fitting pass.
+
+    Maps that offload to disk are not cached (they also need an offload folder).
+
+    Args:
+        model_name: Model name from MODEL_CONFIGS
+        max_memory: Memory limits passed to from_pretrained
+        quantization: Quantization mode from the config (or None)
+        device_map: The model's resolved hf_device_map
+    """
+    if not device_map or "disk" in device_map.values():
+        return
+    cache_file = _device_map_cache_file(model_name, max_memory, quantization)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump(device_map, f)
+    except OSError as e:
+        logger.warning(f"  Could not cache device map: {e}")
+
+
+def _mem_snapshot(device: int = 0):
+    """
+    Read allocated, reserved and total memory of a GPU in one go.
+
+    Args:
+        device: CUDA device index
+
+    Returns:
+        Tuple of (allocated, reserved, total) in GB
+    """
+    allocated = torch.cuda.memory_allocated(device) / 1e9
+    reserved = torch.cuda.memory_reserved(device) / 1e9
+    total = torch.cuda.get_device_properties(device).total_memory / 1e9
+    return allocated, reserved, total
+
+
+class JSONBraceStop(StoppingCriteria):
+    """
+    Stop generation as soon as the top-level JSON object of the output is closed.
+
+    Brace depth is tracked per batch row on the newly generated tokens, ignoring
+    braces inside JSON strings. For reasoning models the counting only starts
+    after the closing </think> tag, so braces in the chain-of-thought are skipped.
+    max_new_tokens stays the hard upper bound.
+
+    Speculative decoding (draft model or prompt lookup) can accept several tokens
+    in one step, so every call decodes all tokens after the last position seen,
+    not just the final one. Rows are left-padded to a common length, so a single
+    position covers the whole batch.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, batch_size: int = 1, wait_for_think_end: bool = False):
+        self.tokenizer = tokenizer
+        # input_ids position up to which tokens have been consumed
+        self.seen = prompt_length
+        self.counting = [not wait_for_think_end] * batch_size
+        self.tail = [""] * batch_size
+        self.depth = [0] * batch_size
+        self.seen_open = [False] * batch_size
+        self.in_string = [False] * batch_size
+        self.escaped = [False] * batch_size
+        self.done = [False] * batch_size
+
+    def _consume(self, row: int, text: str) -> None:
+        for ch in text:
+            if self.in_string[row]:
+                if self.escaped[row]:
+                    self.escaped[row] = False
+                elif ch == "\\":
+                    self.escaped[row] = True
+                elif ch == '"':
+                    self.in_string[row] = False
+            elif ch == '"':
+                self.in_string[row] = self.seen_open[row]
+            elif ch == "{":
+                self.depth[row] += 1
+                self.seen_open[row] = True
+            elif ch == "}" and self.seen_open[row]:
+                self.depth[row] -= 1
+                if self.depth[row] <= 0:
+                    self.done[row] = True
+                    return
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        start, self.seen = self.seen, input_ids.shape[1]
+        for row, token_ids in enumerate(input_ids[:, start:].tolist()):
+            if self.done[row]:
+                continue
+            text = self.tokenizer.decode(token_ids, skip_special_tokens=False)
+
+            if not self.counting[row]:
+                # Keep just enough text to spot a tag split across tokens
+                tail = self.tail[row] + text
+                tag_pos = tail.find(THINK_END_TAG)
+                if tag_pos == -1:
+                    self.tail[row] = tail[-(len(THINK_END_TAG) - 1):]
+                    continue
+                self.counting[row] = True
+                text = tail[tag_pos + len(THINK_END_TAG):]
+
+            self._consume(row, text)
+
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+
 class ModelManager:
-    def __init__(self, temperature: float = 0.1):
+    def __init__(self, temperature: float = 0.0):
         self.current_model = None
         self.current_tokenizer = None
         self.current_model_name = None
         self.temperature = temperature
+        # Models kept resident on the GPUs: name -> (model, tokenizer)
+        self.loaded_models = {}
+        # Persistent static KV caches reused across generate calls: name -> StaticCache
+        self.static_caches = {}
+        # Prefilled KV caches of shared prompt prefixes: (name, prefix) -> (prefix_ids, cache)
+        self.prefix_caches = OrderedDict()
+        # Draft models for speculative decoding: target name -> draft model
+        self.draft_models = {}
+        # Generation settings resolved once per load: name -> settings dict
+        self.generation_settings = {}
+        self.current_settings = None
+
+    def plan_co_residence(self, model_names: List[str]) -> Optional[Dict[str, Dict]]:
+        """
+        Check whether all models fit on the visible GPUs at the same time.
+        
+        Each model is pinned to a single GPU (largest models first) using the
+        "estimated_gb" entry of its config and the currently free memory.
+        
+        Args:
+            model_names: Models that should be loaded together
+            
+        Returns:
+            Mapping of model name to its max_memory dict, or None if the models
+            do not fit (or a footprint estimate is missing)
+        """
+        if not torch.cuda.is_available() or len(model_names) < 2:
+            return None
+        
+        estimates = {}
+        for model_name in model_names:
+            estimated_gb = MODEL_CONFIGS[model_name].get("estimated_gb")
+            if estimated_gb is None:
+                return None
+            estimates[model_name] = estimated_gb
+        
+        num_devices = torch.cuda.device_count()
+        budgets = []
+        for device in range(num_devices):
+            free_bytes, _ = torch.cuda.mem_get_info(device)
+            budgets.append(free_bytes / 2**30 * CO_RESIDENCE_MEMORY_FRACTION)
+        
+        placements = {}
+        for model_name in sorted(model_names, key=lambda m: estimates[m], reverse=True):
+            device = max(range(num_devices), key=lambda d: budgets[d])
+            if budgets[device] < estimates[model_name]:
+                return None
+            budgets[device] -= estimates[model_name]
+            placements[model_name] = {
+                d: (f"{int(estimates[model_name]) + 1}GiB" if d == device else "0GiB")
+                for d in range(num_devices)
+            }
+        
+        return placements
+
+    def use_model(self, model_name: str) -> bool:
+        """
+        Make an already resident model the current one without reloading it.
+        
+        Args:
+            model_name: Name of a model previously loaded with load_model()
+            
+        Returns:
+            True if the model was resident and is now current
+        """
+        if model_name not in self.loaded_models:
+            return False
+        self.current_model, self.current_tokenizer = self.loaded_models[model_name]
+        self.current_model_name = model_name
+        self.current_settings = self.generation_settings[model_name]
+        return True
 
-    def load_model(self, model_name: str) -> bool:
+    def load_model(self, model_name: str, max_memory: Optional[Dict] = None) -> bool:
         try:
             config = MODEL_CONFIGS[model_name]
             model_path = config["path"]
@@ -33,24 +353,38 @@ class ModelManager:
             logger.info(f"  Path: {model_path}")
             logger.info(f"  Description: {config['description']}")
 
+            # Cap this process's share of each GPU; applied per load so CPU-only and
+            # validate-only runs never initialize CUDA
+            if torch.cuda.is_available():
+                fraction = config.get("per_process_memory_fraction", PER_PROCESS_MEMORY_FRACTION)
+                for device in range(torch.cuda.device_count()):
+                    torch.cuda.set_per_process_memory_fraction(fraction, device)
+
+            # Rust fast tokenizer by default; configs can opt out with "use_fast": False
+            use_fast = config.get("use_fast", True)
+            tokenizer_kwargs = {} if use_fast else {"legacy": False}
             self.current_tokenizer = AutoTokenizer.from_pretrained(
                 model_path,
-                use_fast=False,
-                legacy=False,
+                use_fast=use_fast,
                 padding_side="left",
-                trust_remote_code=True
+                trust_remote_code=True,
+                **tokenizer_kwargs
             )
+            if use_fast and not self.current_tokenizer.is_fast:
+                logger.warning(f"  No fast tokenizer available for {model_name}, using the slow Python tokenizer")
 
             quantization_config = None
             llm_int8_enable_fp32_cpu_offload = config.get("llm_int8_enable_fp32_cpu_offload", False)
 
             if config.get("quantization") == "4bit":
                 logger.info(f"  Using 4-bit NF4 quantization for memory efficiency")
+                # Double quantization saves ~0.4 bits/param but adds a second dequant
+                # step to every matmul; configs with memory headroom can turn it off
                 quantization_config = BitsAndBytesConfig(
                     load_in_4bit=True,
                     bnb_4bit_quant_type="nf4",
                     bnb_4bit_compute_dtype=torch.bfloat16,
-                    bnb_4bit_use_double_quant=True,
+                    bnb_4bit_use_double_quant=config.get("bnb_double_quant", True),
                     llm_int8_enable_fp32_cpu_offload=llm_int8_enable_fp32_cpu_offload
                 )
             elif config.get("quantization") == "8bit":
@@ -60,35 +394,82 @@ class ModelManager:
                     llm_int8_enable_fp32_cpu_offload=llm_int8_enable_fp32_cpu_offload
                 )
 
-            max_memory = config.get("max_memory", None)
+            if max_memory is None:
+                max_memory = config.get("max_memory", None)
             if max_memory:
                 logger.info(f"  Using multi-GPU setup with memory limits: {max_memory}")
                 if llm_int8_enable_fp32_cpu_offload:
                     logger.info(f"  CPU offload enabled for layers that don't fit in GPU")
 
-            self.current_model = AutoModelForCausalLM.from_pretrained(
-                model_path,
-                device_map="auto",
-                max_memory=max_memory,
-                torch_dtype=torch.bfloat16 if quantization_config is None else None,
-                quantization_config=quantization_config,
-                trust_remote_code=True
-            )
+            # Fused attention: SDPA by default, FlashAttention-2 if a config asks for it.
+            # bitsandbytes-quantized models stay on SDPA.
+            attn_implementation = config.get("attn_implementation", "sdpa")
+            if quantization_config is not None and attn_implementation == "flash_attention_2":
+                attn_implementation = "sdpa"
+            logger.info(f"  Attention implementation: {attn_implementation}")
+
+            prefetched = prefetch_checkpoint(model_path)
+            if prefetched:
+                logger.info(f"  Prefetching {prefetched / 1e9:.1f}GB of weights from disk")
+
+            # Reuse the placement resolved by an earlier load with the same limits and GPUs
+            device_map = load_cached_device_map(model_name, max_memory, config.get("quantization"))
+            if device_map != "auto":
+                logger.info(f"  Using cached device map")
+
+            with skip_weight_init():
+                self.current_model = AutoModelForCausalLM.from_pretrained(
+                    model_path,
+                    device_map=device_map,
+                    max_memory=max_memory,
+                    torch_dtype=torch.bfloat16 if quantization_config is None else None,
+                    quantization_config=quantization_config,
+                    attn_implementation=attn_implementation,
+                    low_cpu_mem_usage=True,
+                    trust_remote_code=True
+                )
+
+            if device_map == "auto":
+                save_device_map(
+                    model_name, max_memory, config.get("quantization"),
+                    getattr(self.current_model, "hf_device_map", None)
+                )
+
+            # Reuse EOS as padding (masked anyway with left padding) instead of adding a
+            # new token, which would reallocate the embedding and lm_head matrices
+            if self.current_tokenizer.pad_token_id is None:
+                self.current_tokenizer.pad_token = self.current_tokenizer.eos_token
+                self.current_model.config.pad_token_id = self.current_tokenizer.eos_token_id
+                self.current_model.generation_config.pad_token_id = self.current_tokenizer.eos_token_id
 
-            if self.current_tokenizer.pad_token is None:
-                self.current_tokenizer.add_special_tokens({"pad_token": "<pad>"})
+            # Only grow the embeddings if the tokenizer really has more tokens than the model
+            num_embeddings = self.current_model.get_input_embeddings().num_embeddings
+            if len(self.current_tokenizer) > num_embeddings:
+                logger.info(f"  Resizing token embeddings {num_embeddings} → {len(self.current_tokenizer)}")
                 self.current_model.resize_token_embeddings(len(self.current_tokenizer))
-                self.current_model.config.pad_token_id = self.current_tokenizer.pad_token_id
-                self.current_model.generation_config.pad_token_id = self.current_tokenizer.pad_token_id
+
+            # Opt-in torch.compile of the forward pass (bitsandbytes layers do not compile)
+            if config.get("compile", False) and quantization_config is None:
+                self._compile_model()
+
+            # Optional small draft model for speculative (assisted) decoding
+            draft_name = config.get("draft_model")
+            if draft_name:
+                draft_model = self._load_draft_model(draft_name)
+                if draft_model is not None:
+                    self.draft_models[model_name] = draft_model
+
+            self.current_settings = self._resolve_generation_settings(config)
+            self.generation_settings[model_name] = self.current_settings
 
             self.current_model_name = model_name
+            self.loaded_models[model_name] = (self.current_model, self.current_tokenizer)
 
-            if torch.cuda.is_available():
-                allocated = torch.cuda.memory_allocated(0) / 1e9
-                reserved = torch.cuda.memory_reserved(0) / 1e9
-                total = torch.cuda.get_device_properties(0).total_memory / 1e9
+            # Memory polling synchronizes with the device, so it only runs when debugging
+            if torch.cuda.is_available() and logger.isEnabledFor(logging.DEBUG):
+                allocated, reserved, total = _mem_snapshot(0)
                 available = total - allocated
-                logger.info(f"  GPU Memory: {allocated:.2f}GB allocated, {available:.2f}GB available (of {total:.2f}GB total)")
+                logger.debug(f"  GPU Memory: {allocated:.2f}GB allocated, {available:.2f}GB available (of {total:.2f}GB total)")
 
             logger.info(f"  ✓ Successfully loaded {model_name}")
             return True
@@ -98,42 +479,242 @@ class ModelManager:
             self.current_model = None
             self.current_tokenizer = None
             self.current_model_name = None
+            self.current_settings = None
             return False
 
+    def _resolve_generation_settings(self, config: Dict) -> Dict:
+        """
+        Resolve everything generate() needs from the model config once, at load time.
+        
+        Args:
+            config: The model's MODEL_CONFIGS entry
+            
+        Returns:
+            Settings dict with the static generate kwargs ("gen_kwargs") and the
+            per-call switches used by _generate_batch
+        """
+        # Greedy unless a real temperature is set
+        do_sample = self.temperature > 1e-5
+        gen_kwargs = {
+            "max_new_tokens": config.get("max_new_tokens", 2048),
+            "do_sample": do_sample,
+            "num_beams": 1,
+            "pad_token_id": self.current_tokenizer.pad_token_id,
+            "eos_token_id": self.current_tokenizer.eos_token_id,
+        }
+        
+        # Only add sampling parameters if sampling is enabled
+        if do_sample:
+            gen_kwargs["temperature"] = self.temperature
+            gen_kwargs["top_p"] = 0.95
+        
+        # Extra per-model stop strings (e.g. a closing tag the prompt asks for)
+        stop_strings = config.get("stop_strings")
+        if stop_strings:
+            gen_kwargs["stop_strings"] = stop_strings
+            gen_kwargs["tokenizer"] = self.current_tokenizer
+        
+        # KV cache: quantized for long generations ("kv_cache_quant": True, or a dict of
+        # cache_config overrides such as {"nbits": 2}; needs optimum-quanto or HQQ),
+        # otherwise optionally one fixed-size static cache reused across calls
+        kv_cache_quant = config.get("kv_cache_quant")
+        if kv_cache_quant:
+            cache_config = {"backend": "quanto", "nbits": 4, "compute_dtype": torch.bfloat16}
+            if isinstance(kv_cache_quant, dict):
+                cache_config.update(kv_cache_quant)
+            gen_kwargs["cache_implementation"] = "quantized"
+            gen_kwargs["cache_config"] = cache_config
+        static_cache = not kv_cache_quant and (
+            config.get("static_cache", False)
+            or self.current_model.generation_config.cache_implementation == "static"
+        )
+        
+        return {
+            "gen_kwargs": gen_kwargs,
+            "batch_size": max(1, config.get("batch_size", 1)),
+            "think_tags": config.get("think_tags", False),
+            "static_cache": static_cache,
+            "custom_cache": bool(kv_cache_quant) or static_cache,
+            "num_assistant_tokens": config.get("num_assistant_tokens", 5),
+            # Opt-in ("prompt_lookup_num_tokens": n): single prompts that use it skip the
+            # system-prompt prefix cache, so only enable it where it measured faster
+            "prompt_lookup_num_tokens": config.get("prompt_lookup_num_tokens"),
+        }
+
+    def _load_draft_model(self, draft_name: str):
+        """
+        Load the draft model used for speculative decoding.
+        
+        The draft must share the target's tokenizer (e.g. a small Llama-3 model
+        for DeepSeek-R1-Distill-Llama). A draft that fails to load only disables
+        speculative decoding.
+        
+        Args:
+            draft_name: Name of the draft model in MODEL_CONFIGS
+            
+        Returns:
+            The loaded draft model, or None
+        """
+        try:
+            draft_config = MODEL_CONFIGS[draft_name]
+            logger.info(f"  Loading draft model {draft_name} for speculative decoding")
+            with skip_weight_init():
+                return AutoModelForCausalLM.from_pretrained(
+                    draft_config["path"],
+                    device_map="auto",
+                    max_memory=draft_config.get("max_memory"),
+                    torch_dtype=torch.bfloat16,
+                    low_cpu_mem_usage=True,
+                    trust_remote_code=True
+                )
+        except Exception as e:
+            logger.warning(f"  Could not load draft model {draft_name}: {str(e)}")
+            return None
+
+    def _compile_model(self) -> None:
+        """
+        Compile the current model's forward pass and warm it up.
+        
+        A static KV cache keeps decode shapes stable, which "reduce-overhead"
+        needs to record CUDA graphs. Only forward is compiled, so generate(),
+        .device and .config keep working on the original model object. A short
+        warmup generation pays the compile/capture cost at load time instead
+        of on the first table.
+        """
+        logger.info(f"  Compiling model forward pass (torch.compile, reduce-overhead)")
+        self.current_model.generation_config.cache_implementation = "static"
+        self.current_model.forward = torch.compile(
+            self.current_model.forward,
+            mode="reduce-overhead",
+            fullgraph=False
+        )
+        
+        warmup_inputs = self.current_tokenizer("{", return_tensors="pt").to(self.current_model.device)
+        with torch.inference_mode():
+            self.current_model.generate(
+                **warmup_inputs,
+                max_new_tokens=16,
+                do_sample=False,
+                pad_token_id=self.current_tokenizer.pad_token_id
+            )
+
+    def _get_static_cache(self, batch_size: int, max_cache_len: int) -> Optional[StaticCache]:
+        """
+        Return the current model's persistent StaticCache, reset for a new call.
+        
+        The cache is only reallocated when the batch size or length changes, so
+        repeated calls reuse the same KV buffers (and the same CUDA graphs when
+        compiled). Models sharded over several devices let generate() build its
+        own cache instead.
+        
+        Args:
+            batch_size: Number of prompts in the batch
+            max_cache_len: Prompt length plus max_new_tokens
+            
+        Returns:
+            StaticCache, or None if the model is spread over several devices
+        """
+        device_map = getattr(self.current_model, "hf_device_map", None) or {}
+        if len(set(device_map.values())) > 1:
+            return None
+        
+        cache = self.static_caches.get(self.current_model_name)
+        if cache is not None and cache.max_batch_size == batch_size and cache.max_cache_len == max_cache_len:
+            cache.reset()
+            return cache
+        
+        cache = StaticCache(
+            config=self.current_model.config,
+            max_batch_size=batch_size,
+            max_cache_len=max_cache_len,
+            device=self.current_model.device,
+            dtype=self.current_model.dtype
+        )
+        self.static_caches[self.current_model_name] = cache
+        return cache
+
+    @staticmethod
+    def _release_model_storage(model) -> None:
+        """
+        Drop a model's weights even if something still holds a reference to it.
+        
+        accelerate dispatch hooks and tied-weight maps keep back-references to
+        the module, so `del` alone may leave the tensors alive. Removing the
+        hooks and swapping every parameter and buffer for an empty tensor frees
+        the storage deterministically.
+        """
+        try:
+            from accelerate.hooks import remove_hook_from_submodules
+            remove_hook_from_submodules(model)
+        except ImportError:
+            pass
+        
+        with torch.no_grad():
+            for param in model.parameters():
+                param.data = torch.empty(0, dtype=param.dtype, device=param.device)
+            for buffer in model.buffers():
+                buffer.data = torch.empty(0, dtype=buffer.dtype, device=buffer.device)
+        model.generation_config = None
+
     def unload_model(self) -> None:
         if self.current_model is not None:
             logger.info(f"  Unloading {self.current_model_name}...")
-            if torch.cuda.is_available():
-                allocated_before = torch.cuda.memory_allocated(0) / 1e9
-                logger.info(f"  GPU Memory before unload: {allocated_before:.2f}GB allocated")
+            # Memory polling synchronizes with the device, so it only runs when debugging
+            log_memory = torch.cuda.is_available() and logger.isEnabledFor(logging.DEBUG)
+            if log_memory:
+                allocated_before, _, _ = _mem_snapshot(0)
+                logger.debug(f"  GPU Memory before unload: {allocated_before:.2f}GB allocated")
+            self.loaded_models.pop(self.current_model_name, None)
+            self.static_caches.pop(self.current_model_name, None)
+            self.generation_settings.pop(self.current_model_name, None)
+            draft_model = self.draft_models.pop(self.current_model_name, None)
+            if draft_model is not None:
+                self._release_model_storage(draft_model)
+                del draft_model
+            for key in [k for k in self.prefix_caches if k[0] == self.current_model_name]:
+                del self.prefix_caches[key]
+            model_ref = weakref.ref(self.current_model)
+            self._release_model_storage(self.current_model)
             del self.current_model
             del self.current_tokenizer
             self.current_model = None
             self.current_tokenizer = None
             self.current_model_name = None
-            import gc
+            self.current_settings = None
             gc.collect()
+            if model_ref() is not None and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"  Model object is still referenced after unload")
             torch.cuda.empty_cache()
             if torch.cuda.is_available():
-                allocated_after = torch.cuda.memory_allocated(0) / 1e9
-                reserved = torch.cuda.memory_reserved(0) / 1e9
-                total = torch.cuda.get_device_properties(0).total_memory / 1e9
+                # Release CUDA IPC handles that may still pin freed blocks
+                torch.cuda.ipc_collect()
+            if log_memory:
+                allocated_after, _, total = _mem_snapshot(0)
                 freed = allocated_before - allocated_after
                 available = total - allocated_after
-                logger.info(f"  GPU Memory after unload: {allocated_after:.2f}GB allocated, {available:.2f}GB available")
-                logger.info(f"  ✓ Freed {freed:.2f}GB of GPU memory")
-            else:
-                logger.info(f"  ✓ Model unloaded")
+                logger.debug(f"  GPU Memory after unload: {allocated_after:.2f}GB allocated, {available:.2f}GB available")
+                logger.debug(f"  Freed {freed:.2f}GB of GPU memory")
+            logger.info(f"  ✓ Model unloaded")
+
+    def unload_all_models(self) -> None:
+        """Unload every resident model, including the current one."""
+        for model_name in list(self.loaded_models):
+            self.use_model(model_name)
+            self.unload_model()
     
     def generate_text(
         self,
         prompt: str,
+        prefix: Optional[str] = None,
     ) -> str:
         """
         Generate text using the current model.
         
         Args:
             prompt: The prompt to send to the model
+            prefix: Optional leading part of the prompt shared by many calls
+                (e.g. the system prompt). Its KV cache is computed once and
+                reused, so only the rest of the prompt is prefilled.
             
         Returns:
             Generated text (decoded, without input prompt)
@@ -141,45 +722,135 @@ class ModelManager:
         if self.current_model is None or self.current_tokenizer is None:
             raise RuntimeError("No model is currently loaded. Call load_model() first.")
         
-        # Tokenize input
+        return self._generate_batch([prompt], prefix=prefix)[0]
+    
+    def generate_texts(
+        self,
+        prompts: List[str],
+    ) -> List[str]:
+        """
+        Generate text for several prompts, batching them through one generate call.
+        
+        Each forward pass streams the weights once for the whole batch instead of
+        once per prompt. Prompts are split into chunks of the model's "batch_size"
+        config entry (default 1) and left-padded within a chunk.
+        
+        Args:
+            prompts: The prompts to send to the model
+            
+        Returns:
+            Generated texts (decoded, without input prompts), in prompt order
+        """
+        if self.current_model is None or self.current_tokenizer is None:
+            raise RuntimeError("No model is currently loaded. Call load_model() first.")
+        
+        batch_size = self.current_settings["batch_size"]
+        
+        generated_texts = []
+        for start in range(0, len(prompts), batch_size):
+            generated_texts.extend(self._generate_batch(prompts[start:start + batch_size]))
+        return generated_texts
+    
+    def _get_prefix_cache(self, prefix: str):
+        """
+        Return (prefix_ids, KV cache) for a prompt prefix, prefilling it on a miss.
+        
+        Args:
+            prefix: Leading text shared by many prompts
+            
+        Returns:
+            Tuple of the prefix token ids (1 x n) and the cache after prefilling them
+        """
+        key = (self.current_model_name, prefix)
+        if key in self.prefix_caches:
+            self.prefix_caches.move_to_end(key)
+            return self.prefix_caches[key]
+        
+        prefix_ids = self.current_tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.current_model.device)
+        with torch.inference_mode():
+            prefix_cache = self.current_model(prefix_ids, use_cache=True).past_key_values
+        
+        self.prefix_caches[key] = (prefix_ids, prefix_cache)
+        if len(self.prefix_caches) > PREFIX_CACHE_SIZE:
+            self.prefix_caches.popitem(last=False)
+        return prefix_ids, prefix_cache
+    
+    def _generate_batch(self, prompts: List[str], prefix: Optional[str] = None) -> List[str]:
+        """Run one generate call over a batch of prompts (prefix reuse for single prompts)."""
+        settings = self.current_settings
+        
+        # Tokenize input (left padding, so every row's output starts at the same column)
         inputs = self.current_tokenizer(
-            prompt,
+            prompts,
             return_tensors="pt",
+            padding=True,
             truncation=True,
             max_length=4096
-        ).to(self.current_model.device)
+        )
+        
+        # Copy from pinned memory without blocking so the transfer overlaps kernel launches
+        device = self.current_model.device
+        if device.type == "cuda":
+            inputs = {k: v.pin_memory().to(device, non_blocking=True) for k, v in inputs.items()}
+        else:
+            inputs = inputs.to(device)
         
         input_length = inputs['input_ids'].shape[1]
         
-        # Get model-specific max_new_tokens limit
-        config = MODEL_CONFIGS[self.current_model_name]
-        max_new_tokens = config.get("max_new_tokens", 2048)
+        # Stop as soon as the JSON object is complete instead of running to max_new_tokens
+        json_stop = JSONBraceStop(
+            self.current_tokenizer,
+            input_length,
+            batch_size=len(prompts),
+            wait_for_think_end=settings["think_tags"]
+        )
         
-        # Prepare generation kwargs
-        gen_kwargs = {
-            "max_new_tokens": max_new_tokens,
-            "do_sample": self.temperature > 0,
-            "pad_token_id": self.current_tokenizer.pad_token_id,
-            "eos_token_id": self.current_tokenizer.eos_token_id
-        }
+        # Static kwargs were resolved at load time; only per-call entries are added here
+        gen_kwargs = dict(settings["gen_kwargs"])
+        gen_kwargs["stopping_criteria"] = StoppingCriteriaList([json_stop])
         
-        # Only add sampling parameters if sampling is enabled
-        if self.temperature > 0:
-            gen_kwargs["temperature"] = self.temperature
-            gen_kwargs["top_p"] = 0.95
+        # Speculative decoding: the draft proposes tokens, the target verifies them in one
+        # forward pass. Assisted generation supports single prompts with a dynamic cache only.
+        # Without a draft, prompt-lookup decoding drafts n-grams copied from the prompt,
+        # which KPI outputs echo heavily (labels, units, years).
+        draft_model = self.draft_models.get(self.current_model_name)
+        speculative = len(prompts) == 1 and not settings["custom_cache"]
+        if speculative and draft_model is not None:
+            gen_kwargs["assistant_model"] = draft_model
+            gen_kwargs["num_assistant_tokens"] = settings["num_assistant_tokens"]
+        elif speculative and settings["prompt_lookup_num_tokens"]:
+            gen_kwargs["prompt_lookup_num_tokens"] = settings["prompt_lookup_num_tokens"]
+        else:
+            speculative = False
+        
+        # Start from the prefilled prefix cache when the prompt begins with the same tokens
+        # (only with the default dynamic cache and without speculative decoding)
+        prefix_cache = None
+        if (prefix and len(prompts) == 1 and prompts[0].startswith(prefix)
+                and not settings["custom_cache"] and not speculative):
+            prefix_ids, cached = self._get_prefix_cache(prefix)
+            num_prefix = prefix_ids.shape[1]
+            if input_length > num_prefix and torch.equal(inputs["input_ids"][0, :num_prefix], prefix_ids[0]):
+                prefix_cache = cached
+        
+        # Reuse one fixed-size KV cache (prompt budget + max_new_tokens) across calls
+        if settings["static_cache"]:
+            static_cache = self._get_static_cache(len(prompts), 4096 + gen_kwargs["max_new_tokens"])
+            if static_cache is not None:
+                gen_kwargs["past_key_values"] = static_cache
         
         # Generate response
         with torch.inference_mode():
+            if prefix_cache is not None:
+                # generate() extends the cache in place, so work on a copy
+                gen_kwargs["past_key_values"] = copy.deepcopy(prefix_cache)
             outputs = self.current_model.generate(**inputs, **gen_kwargs)
         
         # Decode only the newly generated tokens (skip input prompt)
-        generated_ids = outputs[0][input_length:]
-        generated_text = self.current_tokenizer.decode(
-            generated_ids,
+        return self.current_tokenizer.batch_decode(
+            outputs[:, input_length:],
             skip_special_tokens=True
         )
-        
-        return generated_text
 
 # Export for use in extract_kpis_multi_model.py
 __all__ = ["MODEL_CONFIGS", "ModelManager"]
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Content-hash result cache for KPI extraction.
+
+Identical tables (same content, different table_id) show up repeatedly across
+years and sections. Results are keyed by (model, hash of the table content and
+the extraction settings) and persisted to SQLite so duplicates and reruns skip
+generation entirely. Any setting that changes the result (prompt, generation
+config, correction iterations) must be part of the hashed settings, otherwise a
+later run with different settings would reuse stale results.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Fields that identify a table but do not change what the model sees as data
+IDENTITY_FIELDS = ("table_id", "doc_id")
+
+
+class ResultCache:
+    """SQLite-backed cache of extraction results keyed by (model, table hash)."""
+
+    def __init__(self, cache_path: Path):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            cache_path: Path to the SQLite cache file
+        """
+        self.cache_path = Path(cache_path)
+        self.conn = sqlite3.connect(str(self.cache_path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "model TEXT NOT NULL, "
+            "table_hash TEXT NOT NULL, "
+            "result TEXT NOT NULL, "
+            "PRIMARY KEY (model, table_hash))"
+        )
+        self.conn.commit()
+        self.hits = 0
+
+    @staticmethod
+    def table_key(table_data: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Hash the canonicalized table content together with the extraction settings.
+
+        Args:
+            table_data: Table dictionary
+            settings: Everything besides the table that changes the result
+
+        Returns:
+            Hex SHA1 digest of the table without its identity fields, plus settings
+        """
+        content = {k: v for k, v in table_data.items() if k not in IDENTITY_FIELDS}
+        canonical = json.dumps(
+            {"table": content, "settings": settings or {}},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, table_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            model_name: Model that produced the result
+            table_hash: Key from table_key()
+
+        Returns:
+            A fresh copy of the cached result, or None on a miss
+        """
+        row = self.conn.execute(
+            "SELECT result FROM results WHERE model = ? AND table_hash = ?",
+            (model_name, table_hash)
+        ).fetchone()
+        if row is None:
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, model_name: str, table_hash: str, result: Dict[str, Any]) -> None:
+        """
+        Store a result and persist it immediately.
+
+        Args:
+            model_name: Model that produced the result
+            table_hash: Key from table_key()
+            result: Extraction result to cache
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (model, table_hash, result) VALUES (?, ?, ?)",
+            (model_name, table_hash, json.dumps(result, ensure_ascii=False))
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        self.conn.close()
@@ -0,0 +1,6 @@
+"""Make the project's flat modules (extract_kpis, validate, ...) importable from tests."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
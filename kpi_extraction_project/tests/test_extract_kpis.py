@@ -0,0 +1,120 @@
+"""Correction loop of KPIExtractor, run against a scripted model instead of an LLM."""
+
+import builtins
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import extract_kpis
+from extract_kpis import KPIExtractor
+from model import MODEL_CONFIGS
+from result_cache import ResultCache
+
+MODEL_NAME = next(iter(MODEL_CONFIGS))
+
+TABLE = {
+    "table_id": "t1",
+    "title": "Key figures",
+    "section_name": "Group",
+    "merged_headers": ["", "2023", "2022"],
+    "stub_col": ["Deliveries", "Sales revenue"],
+    "rows": [["Deliveries", "409", "329"], ["Sales revenue", "1,234", "1,100"]],
+}
+
+
+class ScriptedModelManager:
+    """Returns the queued outputs in order and records every prompt it receives."""
+    
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+        self.prompts = []
+        self.temperature = 0.0
+    
+    def generate_text(self, prompt):
+        self.prompts.append(prompt)
+        return self.outputs.pop(0)
+
+
+def _kpi(value, row_idx, col_idx, col_name):
+    return {
+        "name": "Deliveries", "key": "Group", "units": "thousand units",
+        "value": value, "year": int(col_name),
+        "row_name": "Deliveries", "row_idx": row_idx,
+        "col_name": col_name, "col_idx": col_idx,
+    }
+
+
+@pytest.fixture
+def extractor(monkeypatch, tmp_path):
+    # Correction debug files go to a cluster path; keep them in tmp_path instead
+    monkeypatch.setattr(
+        extract_kpis, "open",
+        lambda path, *args, **kwargs: builtins.open(tmp_path / Path(path).name, *args, **kwargs),
+        raising=False,
+    )
+    extractor = KPIExtractor.__new__(KPIExtractor)
+    extractor.result_cache = None
+    return extractor
+
+
+def test_correction_loop_fixes_invalid_kpi(extractor):
+    good = _kpi(409, 0, 1, "2023")
+    bad = _kpi(409, 0, 2, "2022")  # points at 329
+    corrected = {"kpis": [good, _kpi(329, 0, 2, "2022")]}
+    extractor.model_manager = ScriptedModelManager([json.dumps(corrected)])
+    table = copy.deepcopy(TABLE)
+    
+    result = extractor._validate_and_correct(table, {"kpis": [good, bad]}, MODEL_NAME, max_iterations=3)
+    
+    assert len(extractor.model_manager.prompts) == 1
+    prompt = extractor.model_manager.prompts[0]
+    assert "ERROR 1:" in prompt
+    # Fix instructions point the model at the neighbouring cell holding 409
+    assert "FIX: Large value mismatch" in prompt
+    assert "→ FOUND at [0][1]: 409.0" in prompt
+    assert result["validation_stats"]["iteration"] == 2
+    assert result["validation_stats"]["invalid_kpis"] == 0
+    assert result["kpis"] == corrected["kpis"]
+    assert "invalid_kpis" not in result
+    # Validation must not leave its lookups on the table that prompts and checkpoints serialize
+    assert table == TABLE
+
+
+def test_correction_loop_keeps_only_valid_after_max_iterations(extractor):
+    good = _kpi(409, 0, 1, "2023")
+    bad = _kpi(999, 0, 2, "2022")
+    extractor.model_manager = ScriptedModelManager([])
+    
+    result = extractor._validate_and_correct(copy.deepcopy(TABLE), {"kpis": [good, bad]}, MODEL_NAME, max_iterations=1)
+    
+    assert extractor.model_manager.prompts == []
+    assert result["kpis"] == [good]
+    assert result["invalid_kpis"] == [bad]
+
+
+def test_result_cache_misses_when_correction_iterations_change(extractor, tmp_path):
+    extractor.model_manager = ScriptedModelManager([])
+    extractor.result_cache = ResultCache(tmp_path / ".cache.sqlite")
+    calls = []
+    
+    def fake_extract(table_data, model_name, max_correction_iterations=3):
+        calls.append(max_correction_iterations)
+        return {"kpis": [], "model": model_name, "iterations": max_correction_iterations}
+    
+    extractor._extract_kpis_uncached = fake_extract
+    
+    unvalidated = extractor.extract_kpis(copy.deepcopy(TABLE), MODEL_NAME, max_correction_iterations=0)
+    corrected = extractor.extract_kpis(copy.deepcopy(TABLE), MODEL_NAME, max_correction_iterations=3)
+    again = extractor.extract_kpis(dict(TABLE, table_id="t2"), MODEL_NAME, max_correction_iterations=3)
+    
+    assert calls == [0, 3]
+    assert unvalidated["iterations"] == 0
+    assert corrected["iterations"] == 3
+    assert again == corrected
+    assert extractor.result_cache.hits == 1
+    extractor.result_cache.close()
@@ -0,0 +1,26 @@
+"""Checkpoint files read back by process_database on resume."""
+
+import json
+
+from loader import convert_legacy_checkpoint, iter_checkpoint_results, load_processed_ids
+
+
+def test_convert_legacy_checkpoint(tmp_path):
+    results = [{"table_id": "VW2019_T1", "kpis": []}, {"table_id": "VW2019_T2", "error": "boom"}]
+    legacy = tmp_path / "checkpoint_20251101_m_year2019_kpis.json"
+    legacy.write_text(json.dumps({"metadata": {"checkpoint": True}, "results": results}), encoding="utf-8")
+    
+    converted = convert_legacy_checkpoint(legacy)
+    
+    assert converted == tmp_path / "checkpoint_20251101_m_year2019_kpis.jsonl"
+    assert not legacy.exists()
+    assert list(iter_checkpoint_results(converted)) == results
+    assert load_processed_ids(converted) == {"VW2019_T1", "VW2019_T2"}
+
+
+def test_convert_legacy_checkpoint_keeps_unreadable_file(tmp_path):
+    legacy = tmp_path / "checkpoint_20251101_m_year2019_kpis.json"
+    legacy.write_text('{"results": [', encoding="utf-8")
+    
+    assert convert_legacy_checkpoint(legacy) is None
+    assert legacy.exists()
@@ -0,0 +1,42 @@
+"""JSONBraceStop on generate steps that accept one or several tokens."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from model import JSONBraceStop
+
+
+class CharTokenizer:
+    """One token per character, so test sequences read as plain text."""
+    
+    def decode(self, token_ids, skip_special_tokens=False):
+        return "".join(map(chr, token_ids))
+
+
+def _ids(text):
+    return [ord(ch) for ch in text]
+
+
+def _run(prompt, steps, wait_for_think_end):
+    stop = JSONBraceStop(CharTokenizer(), len(prompt), wait_for_think_end=wait_for_think_end)
+    sequence = _ids(prompt)
+    done = []
+    for step in steps:
+        sequence += _ids(step)
+        done.append(stop(torch.tensor([sequence]), None).tolist()[0])
+    return done
+
+
+def test_multi_token_steps_see_think_tag_and_braces():
+    # Speculative decoding accepts several tokens per step; the tag and the
+    # outer brace both arrive mid-step and must not be skipped
+    steps = ["<th", "ink>{ }", "</think>", '{"a": {"b"', ': 1}, "c": "}"', "}"]
+    assert _run("prompt ", steps, wait_for_think_end=True) == [False] * 5 + [True]
+
+
+def test_single_token_steps():
+    steps = list('x {"a": [1, {"b": 2}]} tail')
+    done = _run("{prompt} ", steps, wait_for_think_end=False)
+    assert done.index(True) == steps.index("]") + 1
@@ -0,0 +1,39 @@
+"""parse_numeric_value on the cell formats found in the report tables, and the tables-file id peek."""
+
+import pytest
+
+from validate import _peek_table_id, parse_numeric_value
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,234,567", 1234567.0),
+    ("1.234,56", 1234.56),
+    ("2,0524", 2.0524),
+    ("−1,4864", -1.4864),
+    ("(12)", -12.0),
+    ("12^7.0", 12.0),
+    # Footnotes are stripped after the format check, so the comma stays a thousands separator
+    ("1,234^7", 1234.0),
+    ("€5M", 5e6),
+    ("3K", 3000.0),
+    (42, 42.0),
+    ("–", None),
+    ("n/a", None),
+    ("abc", None),
+])
+def test_parse_numeric_value(text, expected):
+    assert parse_numeric_value(text) == expected
+
+
+@pytest.mark.parametrize("line, expected", [
+    (b'{"table_id": "VW2019_T1", "rows": [["a", "1"]]}\n', "VW2019_T1"),
+    (b'{"title": "T", "table_id" :"VW2019_T2"}\n', "VW2019_T2"),
+    # A cell reading "table_id" ahead of the real key must not be taken for the id
+    (b'{"rows": [["table_id", "VW2019_T9"]], "table_id": "VW2019_T1"}\n', None),
+    (b'{"title": "table_id", "name": "VW2019_T9", "table_id": "VW2019_T1"}\n', None),
+    (b'{"meta": {"table_id": "VW2019_T9"}, "table_id": "VW2019_T1"}\n', None),
+    (b'{"table_id": "VW\\u00e92019"}\n', None),
+    (b'{"title": "T"}\n', None),
+])
+def test_peek_table_id(line, expected):
+    assert _peek_table_id(line) == expected
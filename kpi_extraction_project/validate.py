@@ -11,16 +11,46 @@ Date: November 2025
 """
 
 import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # optional dependency, stdlib decoder is a drop-in fallback
+    orjson = None
+    _json_loads = json.loads
 
-def parse_numeric_value(text: str) -> Optional[float]:
+# Patterns used by parse_numeric_value, compiled once at import
+_EURO_RE = re.compile(r'^-?[\d\.\s]*,\d{1,4}$')  # "1.234,56" / "2,0524"
+_FOOTNOTE_RE = re.compile(r'\^[\d]+\.?\d*')  # "^7", "^7.0"
+
+# Year in extraction/table file names: "..._linked_tables(2020).json"
+_YEAR_RE = re.compile(r'linked_tables\((\d{4})\)')
+
+# Single-character normalization applied in one pass: minus-sign variants
+# (Unicode minus, en-dash, em-dash) become '-' and spaces go. Both number
+# formats drop spaces, so this can run before the European-format check
+_TRANS = str.maketrans({'−': '-', '–': '-', '—': '-', ' ': None})
+
+# Currency glyphs, removed only after the format and parentheses checks
+_CURRENCY_TRANS = str.maketrans('', '', '€$£¥')
+
+
+def parse_numeric_value(text: Any) -> Optional[float]:
     """
     Parse numeric value from table cell text.
     Handles: commas, parentheses (negatives), currency, footnotes, null indicators.
+    Cells that JSON already decoded as numbers are returned directly.
     """
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return None if text != text else float(text)  # NaN → None
+    
     if not text or not isinstance(text, str):
         return None
     
@@ -30,29 +60,32 @@ def parse_numeric_value(text: str) -> Optional[float]:
     if text in ['–', '—', '', 'x', 'X', 'n/a', 'N/A']:
         return None
     
-    # Handle special minus signs (Unicode minus, en-dash, em-dash)
-    text = text.replace('−', '-').replace('–', '-').replace('—', '-')
+    # Minus signs and spaces in one pass
+    text = text.translate(_TRANS)
     
     # Detect European decimal format (comma as decimal separator)
     # Pattern: digits, optional comma, digits (no period as thousands separator)
     # Examples: "2,0524" → 2.0524, "1.234,56" → 1234.56, "−1,4864" → -1.4864
     # Check if comma appears after digits and is followed by 1-4 digits (decimal part)
     # Also handle cases with both period and comma: period=thousands, comma=decimal
-    european_decimal_pattern = r'^-?[\d\.\s]*,\d{1,4}$'
-    if re.match(european_decimal_pattern, text.replace(' ', '')):
-        # European format: comma is decimal separator, period/space is thousands separator
-        text = text.replace('.', '').replace(' ', '').replace(',', '.')
-    else:
-        # US format: comma is thousands separator, period is decimal separator
-        text = text.replace(',', '').replace(' ', '')
+    # Without a comma both formats read the same, so the pattern is skipped
+    if ',' in text:
+        if _EURO_RE.match(text):
+            # European format: comma is decimal separator, period/space is thousands separator
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            # US format: comma is thousands separator, period is decimal separator
+            text = text.replace(',', '')
     
     # Parentheses = negative
     if text.startswith('(') and text.endswith(')'):
         text = '-' + text[1:-1]
     
-    # Remove currency and footnotes
-    text = re.sub(r'[€$£¥]', '', text)
-    text = re.sub(r'\^[\d]+\.?\d*', '', text)  # Updated to handle ^7.0, ^4.0 etc
+    # Remove currency and footnotes; both run after the format check, so
+    # "1,234^7" is still read as US thousands (1234)
+    text = text.translate(_CURRENCY_TRANS)
+    if '^' in text:
+        text = _FOOTNOTE_RE.sub('', text)
     
     # Abbreviations (K, M, B, T)
     multipliers = {'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
@@ -70,10 +103,170 @@ def parse_numeric_value(text: str) -> Optional[float]:
         return None
 
 
+# Value comparison thresholds (absolute for exact, relative otherwise)
+EXACT_TOLERANCE = 1e-6
+SMALL_REL_DIFF = 0.01
+MODERATE_REL_DIFF = 0.05
+
+# Threads used by main() to write valid/invalid report files
+REPORT_WRITE_THREADS = 4
+
+# Per-file stats summed into the overall summary
+SUMMARY_STATS = (
+    "total_kpis", "valid_kpis", "invalid_kpis",
+    "row_name_verified", "col_name_verified",
+    "row_name_mismatches", "col_name_mismatches", "name_mismatches",
+)
+
+# KPI fields copied into the valid/invalid reports
+KPI_FIELDS = ("name", "key", "units", "value", "year", "row_idx", "col_idx", "row_name", "col_name")
+
+# Outcome of the row_name/col_name cross-check, stored as row_flag/col_flag
+NAME_UNCHECKED, NAME_VERIFIED, NAME_CASE_MISMATCH, NAME_MISMATCH = range(4)
+
+# Classes returned by classify_value_diff
+DIFF_EXACT, DIFF_SMALL, DIFF_MODERATE, DIFF_LARGE = range(4)
+
+
+def _as_float(value: Any) -> Optional[float]:
+    """Return value as a number if it is one or a numeric string, else None."""
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def classify_value_diff(source: float, extracted: float) -> Tuple[int, float, float]:
+    """
+    Classify how far an extracted value is from its source cell.
+    
+    Returns:
+        (diff class, absolute diff, relative diff)
+    """
+    diff = abs(source - extracted)
+    rel_diff = diff / max(abs(source), 1e-9)
+    if diff <= EXACT_TOLERANCE:
+        return DIFF_EXACT, diff, rel_diff
+    if rel_diff < SMALL_REL_DIFF:
+        return DIFF_SMALL, diff, rel_diff
+    if rel_diff < MODERATE_REL_DIFF:
+        return DIFF_MODERATE, diff, rel_diff
+    return DIFF_LARGE, diff, rel_diff
+
+
+class SourceTable:
+    """
+    Per-table lookups that every KPI pointing into the table reuses.
+    
+    Kept apart from the table dict so the table itself is never modified
+    (callers serialize it into prompts, checkpoints and cache keys).
+    
+    Attributes:
+        parsed: Grid parallel to 'rows' holding parse_numeric_value() of each
+            cell, so cells are parsed once per table instead of once per KPI
+        stub_norm, hdr_norm: Stripped row/column labels the name cross-check
+            compares against
+        stub_idx, hdr_idx: Stripped lowercase label → indices where it occurs,
+            for O(1) name-mismatch repair
+    """
+    
+    __slots__ = ("parsed", "stub_norm", "hdr_norm", "stub_idx", "hdr_idx")
+    
+    def __init__(self, table: Dict[str, Any]):
+        self.parsed = [[parse_numeric_value(cell) for cell in row] for row in table.get('rows', [])]
+        self.stub_norm, self.stub_idx = _label_lookups(table.get('stub_col'))
+        self.hdr_norm, self.hdr_idx = _label_lookups(table.get('merged_headers'))
+
+
+def _label_lookups(labels: Optional[List[Any]]) -> Tuple[List[str], Dict[str, List[int]]]:
+    """Return the stripped labels and a lowercase label → indices map."""
+    stripped = [str(label).strip() for label in labels or []]
+    positions = {}
+    for i, label in enumerate(stripped):
+        positions.setdefault(label.lower(), []).append(i)
+    return stripped, positions
+
+
+def prepare_source_table(table: Dict[str, Any]) -> SourceTable:
+    """
+    Build the SourceTable lookups for a table without modifying it.
+    
+    Prepare once per table and pass the result to validate_kpi_indexed() and
+    build_fix_instructions() for every KPI of that table.
+    """
+    return SourceTable(table)
+
+
+class KpiValidation:
+    """
+    Outcome of validating one KPI against its source cell.
+    
+    Uses __slots__ to keep per-KPI memory small; only KPIs written to the
+    invalid report are converted to a dict (to_dict()).
+    
+    Attributes:
+        is_valid, confidence: Verdict and confidence in [0, 1]
+        errors: Human-readable findings (including ✓/⚠ notes)
+        fix_instructions: Filled by build_fix_instructions(), None until then
+        source_cell_value, source_cell_text: Parsed and raw source cell
+        extracted_value: Value reported by the LLM
+        row_idx, col_idx: Indices used (after any auto-correction)
+        row_name_match, col_name_match: Expected labels at those indices
+        row_flag, col_flag: NAME_* outcome of the name cross-checks
+        fixes: (kind, args) fixes recorded for build_fix_instructions()
+    """
+    
+    __slots__ = (
+        "is_valid", "confidence", "errors", "fix_instructions",
+        "source_cell_value", "source_cell_text", "extracted_value",
+        "row_idx", "col_idx", "row_name_match", "col_name_match",
+        "row_flag", "col_flag", "fixes",
+    )
+    
+    def __init__(self, extracted_value: Any = None):
+        self.is_valid = True
+        self.confidence = 1.0
+        self.errors = []
+        self.fix_instructions = None
+        self.source_cell_value = None
+        self.source_cell_text = None
+        self.extracted_value = extracted_value
+        self.row_idx = None
+        self.col_idx = None
+        self.row_name_match = None
+        self.col_name_match = None
+        self.row_flag = NAME_UNCHECKED
+        self.col_flag = NAME_UNCHECKED
+        self.fixes = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary format for JSON serialization."""
+        return {
+            "is_valid": self.is_valid,
+            "confidence": self.confidence,
+            "errors": self.errors,
+            "fix_instructions": self.fix_instructions,
+            "source_cell_value": self.source_cell_value,
+            "source_cell_text": self.source_cell_text,
+            "extracted_value": self.extracted_value,
+            "row_idx": self.row_idx,
+            "col_idx": self.col_idx,
+            "row_name_match": self.row_name_match,
+            "col_name_match": self.col_name_match,
+            "row_flag": self.row_flag,
+            "col_flag": self.col_flag
+        }
+
+
 def validate_kpi_indexed(
     kpi: Dict[str, Any],
-    table_data: Dict[str, Any]
-) -> Dict[str, Any]:
+    table_data: Dict[str, Any],
+    source: Optional[SourceTable] = None
+) -> KpiValidation:
     """
     Validate one KPI using BOTH indices and names for robust verification.
     
@@ -84,20 +277,11 @@ def validate_kpi_indexed(
     - Index errors (off-by-one, wrong convention)
     - Name mismatches (LLM extraction errors)
     - Inconsistent extraction (indices don't match names)
+    
+    source is the table's prepare_source_table() result; it is built here
+    when omitted, so callers validating several KPIs should pass it.
     """
-    result = {
-        "is_valid": True,
-        "confidence": 1.0,
-        "errors": [],
-        "fix_instructions": [],  # Clear instructions for fixing this KPI
-        "source_cell_value": None,
-        "source_cell_text": None,
-        "extracted_value": kpi.get("value"),
-        "row_idx": None,
-        "col_idx": None,
-        "row_name_match": None,
-        "col_name_match": None
-    }
+    result = KpiValidation(kpi.get("value"))
     
     # Extract fields
     row_idx = kpi.get("row_idx")
@@ -115,34 +299,23 @@ def validate_kpi_indexed(
         key_norm = str(kpi_key).strip()
         
         if name_norm == key_norm:
-            result["is_valid"] = False
-            result["confidence"] = 0.5
-            result["errors"].append(f"❌ key and name are identical: '{kpi_key}' (they must be different when both are non-empty)")
-            
-            # Add clear fix instructions
-            table_title = table_data.get('title', '')
-            section_name = table_data.get('section_name', '')
-            result["fix_instructions"].append(f"FIX: key='{kpi_key}' and name='{kpi_name}' are identical. Look at table context:")
-            result["fix_instructions"].append(f"  - Table title: '{table_title}'")
-            result["fix_instructions"].append(f"  - Section: '{section_name}'")
-            result["fix_instructions"].append(f"  - Current row: '{kpi.get('row_name', '')}'")
-            result["fix_instructions"].append(f"SOLUTION: Determine which is the metric (name) vs entity (key):")
-            result["fix_instructions"].append(f"  - If table measures production/sales of vehicles: name='Production' or 'Sales', key='{kpi_key}'")
-            result["fix_instructions"].append(f"  - If table shows KPIs for a company/brand: name='{kpi_name}', key='Company'/'Brand'")
-            result["fix_instructions"].append(f"  - Check title and section to determine the correct interpretation")
+            result.is_valid = False
+            result.confidence = 0.5
+            result.errors.append(f"❌ key and name are identical: '{kpi_key}' (they must be different when both are non-empty)")
+            _defer_fix(result, "key_name")
             return result
     
     # Check required fields
     if row_idx is None:
-        result["is_valid"] = False
-        result["confidence"] = 0.0
-        result["errors"].append("Missing row_idx in KPI")
+        result.is_valid = False
+        result.confidence = 0.0
+        result.errors.append("Missing row_idx in KPI")
         return result
     
     if col_idx is None:
-        result["is_valid"] = False
-        result["confidence"] = 0.0
-        result["errors"].append("Missing col_idx in KPI")
+        result.is_valid = False
+        result.confidence = 0.0
+        result.errors.append("Missing col_idx in KPI")
         return result
     
     # Get table structure
@@ -151,115 +324,109 @@ def validate_kpi_indexed(
     merged_headers = table_data.get('merged_headers', [])
     
     if not rows:
-        result["is_valid"] = False
-        result["confidence"] = 0.0
-        result["errors"].append("No rows in table data")
+        result.is_valid = False
+        result.confidence = 0.0
+        result.errors.append("No rows in table data")
         return result
     
-    result["row_idx"] = row_idx
-    result["col_idx"] = col_idx
+    if source is None:
+        source = prepare_source_table(table_data)
+    parsed = source.parsed
+    
+    result.row_idx = row_idx
+    result.col_idx = col_idx
     
     # Validate row index bounds
-    if row_idx < 0 or row_idx >= len(rows):
-        result["is_valid"] = False
-        result["confidence"] = 0.0
-        result["errors"].append(f"row_idx {row_idx} out of bounds (table has {len(rows)} rows)")
+    if not 0 <= row_idx < len(rows):
+        result.is_valid = False
+        result.confidence = 0.0
+        result.errors.append(f"row_idx {row_idx} out of bounds (table has {len(rows)} rows)")
         return result
     
-    # Validate column index bounds
-    if col_idx < 0 or col_idx >= len(rows[row_idx]):
-        result["is_valid"] = False
-        result["confidence"] = 0.0
-        result["errors"].append(f"col_idx {col_idx} out of bounds (row has {len(rows[row_idx])} cols)")
+    # Validate column index bounds (row length reused by the col_idx+1 fallbacks)
+    row_len = len(rows[row_idx])
+    if not 0 <= col_idx < row_len:
+        result.is_valid = False
+        result.confidence = 0.0
+        result.errors.append(f"col_idx {col_idx} out of bounds (row has {row_len} cols)")
         return result
     
     # Cross-validate row_name with stub_col[row_idx]
     if stub_col and row_idx < len(stub_col):
         expected_row_name = stub_col[row_idx]
-        result["row_name_match"] = expected_row_name
+        result.row_name_match = expected_row_name
         
         if row_name:
             # Normalize for comparison (strip whitespace, case-insensitive)
             row_name_norm = str(row_name).strip()
-            expected_norm = str(expected_row_name).strip()
+            expected_norm = source.stub_norm[row_idx]
             
             if row_name_norm == expected_norm:
                 # Perfect match - boost confidence
-                result["confidence"] *= 1.0
-                result["errors"].append(f"✓ row_name verified: '{row_name}'")
+                result.confidence *= 1.0
+                result.row_flag = NAME_VERIFIED
+                result.errors.append(f"✓ row_name verified: '{row_name}'")
             elif row_name_norm.lower() == expected_norm.lower():
                 # Case-insensitive match - acceptable
-                result["confidence"] *= 0.98
-                result["errors"].append(f"⚠ row_name case mismatch: KPI='{row_name}', expected='{expected_row_name}'")
+                result.confidence *= 0.98
+                result.row_flag = NAME_CASE_MISMATCH
+                result.errors.append(f"⚠ row_name case mismatch: KPI='{row_name}', expected='{expected_row_name}'")
             else:
                 # Complete mismatch - likely extraction error
-                result["is_valid"] = False
-                result["confidence"] = 0.5
-                result["errors"].append(f"❌ row_name MISMATCH: KPI='{row_name}', stub_col[{row_idx}]='{expected_row_name}'")
-                
-                # Add fix instructions
-                result["fix_instructions"].append(f"FIX: row_idx={row_idx} points to wrong row")
-                result["fix_instructions"].append(f"  - Current: row_name='{row_name}' but stub_col[{row_idx}]='{expected_row_name}'")
-                result["fix_instructions"].append(f"SOLUTION: Search stub_col for the correct row_idx where value matches '{row_name}':")
-                for i, stub_name in enumerate(stub_col):
-                    if str(stub_name).strip().lower() == row_name_norm.lower():
-                        result["fix_instructions"].append(f"  → Found at row_idx={i}, stub_col[{i}]='{stub_name}'")
-                        result["fix_instructions"].append(f"  → Update: row_idx: {row_idx} → {i}, row_name: '{expected_row_name}' → '{stub_name}'")
-                        break
+                result.is_valid = False
+                result.confidence = 0.5
+                result.row_flag = NAME_MISMATCH
+                result.errors.append(f"❌ row_name MISMATCH: KPI='{row_name}', stub_col[{row_idx}]='{expected_row_name}'")
+                _defer_fix(result, "row_name", row_idx, row_name, expected_row_name)
         else:
             # row_name missing but we have index - warning only
-            result["confidence"] *= 0.95
-            result["errors"].append(f"⚠ row_name missing, using stub_col[{row_idx}]='{expected_row_name}'")
+            result.confidence *= 0.95
+            result.errors.append(f"⚠ row_name missing, using stub_col[{row_idx}]='{expected_row_name}'")
     
     # Cross-validate col_name with merged_headers[col_idx]
     if merged_headers and col_idx < len(merged_headers):
         expected_col_name = merged_headers[col_idx]
-        result["col_name_match"] = expected_col_name
+        result.col_name_match = expected_col_name
         
         if col_name:
             # Normalize for comparison (strip whitespace, case-insensitive)
             col_name_norm = str(col_name).strip()
-            expected_norm = str(expected_col_name).strip()
+            expected_norm = source.hdr_norm[col_idx]
             
             if col_name_norm == expected_norm:
                 # Perfect match - boost confidence
-                result["confidence"] *= 1.0
-                result["errors"].append(f"✓ col_name verified: '{col_name}'")
+                result.confidence *= 1.0
+                result.col_flag = NAME_VERIFIED
+                result.errors.append(f"✓ col_name verified: '{col_name}'")
             elif col_name_norm.lower() == expected_norm.lower():
                 # Case-insensitive match - acceptable
-                result["confidence"] *= 0.98
-                result["errors"].append(f"⚠ col_name case mismatch: KPI='{col_name}', expected='{expected_col_name}'")
+                result.confidence *= 0.98
+                result.col_flag = NAME_CASE_MISMATCH
+                result.errors.append(f"⚠ col_name case mismatch: KPI='{col_name}', expected='{expected_col_name}'")
             else:
                 # Complete mismatch - warning only (don't invalidate if indices are correct)
-                result["confidence"] *= 0.9
-                result["errors"].append(f"⚠ col_name MISMATCH: KPI='{col_name}', merged_headers[{col_idx}]='{expected_col_name}'")
-                
-                # Add fix instructions (warning, not critical)
-                result["fix_instructions"].append(f"WARNING: col_idx={col_idx} may point to wrong column")
-                result["fix_instructions"].append(f"  - Current: col_name='{col_name}' but merged_headers[{col_idx}]='{expected_col_name}'")
-                result["fix_instructions"].append(f"SOLUTION: Search merged_headers for correct col_idx where value matches '{col_name}':")
-                for i, header in enumerate(merged_headers):
-                    if str(header).strip().lower() == col_name_norm.lower():
-                        result["fix_instructions"].append(f"  → Found at col_idx={i}, merged_headers[{i}]='{header}'")
-                        result["fix_instructions"].append(f"  → Consider updating: col_idx: {col_idx} → {i}, col_name: '{expected_col_name}' → '{header}'")
+                result.confidence *= 0.9
+                result.col_flag = NAME_MISMATCH
+                result.errors.append(f"⚠ col_name MISMATCH: KPI='{col_name}', merged_headers[{col_idx}]='{expected_col_name}'")
+                _defer_fix(result, "col_name", col_idx, col_name, expected_col_name)
         else:
             # col_name missing but we have index - warning only
-            result["confidence"] *= 0.95
-            result["errors"].append(f"⚠ col_name missing, using merged_headers[{col_idx}]='{expected_col_name}'")
+            result.confidence *= 0.95
+            result.errors.append(f"⚠ col_name missing, using merged_headers[{col_idx}]='{expected_col_name}'")
     
     # Extract cell value using indices directly
     cell_text = rows[row_idx][col_idx]
-    result["source_cell_text"] = cell_text
+    result.source_cell_text = cell_text
     
-    # Parse numeric value
-    source_value = parse_numeric_value(str(cell_text))
-    result["source_cell_value"] = source_value
+    # Numeric value (parsed once per table)
+    source_value = parsed[row_idx][col_idx]
+    result.source_cell_value = source_value
     
     # FALLBACK: If col_idx=0 has no numeric value, try col_idx+1
     # This handles cases where LLM incorrectly used col_idx=0 (row label column)
-    if source_value is None and col_idx == 0 and col_idx + 1 < len(rows[row_idx]):
+    if source_value is None and col_idx == 0 and col_idx + 1 < row_len:
         alt_cell_text = rows[row_idx][col_idx + 1]
-        alt_source_value = parse_numeric_value(str(alt_cell_text))
+        alt_source_value = parsed[row_idx][col_idx + 1]
         
         if alt_source_value is not None:
             # Check if col_name matches the next column header
@@ -267,148 +434,276 @@ def validate_kpi_indexed(
                 expected_alt_col = merged_headers[col_idx + 1]
                 # If col_name matches col_idx+1 better than col_idx, use it
                 if col_name and str(col_name).strip() == str(expected_alt_col).strip():
-                    result["errors"].append(f"⚠ Auto-corrected: col_idx=0 (row label) → col_idx=1, found value={alt_source_value}")
-                    result["col_idx"] = col_idx + 1
-                    result["source_cell_text"] = alt_cell_text
+                    result.errors.append(f"⚠ Auto-corrected: col_idx=0 (row label) → col_idx=1, found value={alt_source_value}")
+                    result.col_idx = col_idx + 1
+                    result.source_cell_text = alt_cell_text
                     source_value = alt_source_value
-                    result["source_cell_value"] = source_value
-                    result["col_name_match"] = expected_alt_col
-                    result["confidence"] *= 0.95  # Slight penalty for auto-correction
+                    result.source_cell_value = source_value
+                    result.col_name_match = expected_alt_col
+                    result.confidence *= 0.95  # Slight penalty for auto-correction
     
     # Compare extracted vs source values
     if extracted_value is None and source_value is None:
         # Both null - valid but lower confidence
-        result["confidence"] *= 0.95
-        result["errors"].append(f"Both null (cell: '{cell_text}')")
+        result.confidence *= 0.95
+        result.errors.append(f"Both null (cell: '{cell_text}')")
     elif extracted_value is None:
         # Extracted null but source has value
-        result["is_valid"] = False
-        result["confidence"] = 0.2
-        result["errors"].append(f"Extracted null but source={source_value} (cell: '{cell_text}')")
+        result.is_valid = False
+        result.confidence = 0.2
+        result.errors.append(f"Extracted null but source={source_value} (cell: '{cell_text}')")
     elif source_value is None:
         # Source null but extracted has value
-        result["is_valid"] = False
-        result["confidence"] = 0.2
-        result["errors"].append(f"Source null but extracted={extracted_value} (cell: '{cell_text}')")
+        result.is_valid = False
+        result.confidence = 0.2
+        result.errors.append(f"Source null but extracted={extracted_value} (cell: '{cell_text}')")
     else:
-        # Both should be numeric - ensure types are correct
-        try:
-            extracted_numeric = float(extracted_value) if not isinstance(extracted_value, (int, float)) else extracted_value
-            source_numeric = float(source_value) if not isinstance(source_value, (int, float)) else source_value
-        except (ValueError, TypeError) as e:
-            result["is_valid"] = False
-            result["confidence"] = 0.0
-            result["errors"].append(f"Type conversion error: extracted={extracted_value} (type={type(extracted_value).__name__}), source={source_value} (type={type(source_value).__name__})")
+        # Both should be numeric - source cells are already floats from
+        # parse_numeric_value, only the extracted value needs checking
+        extracted_numeric = _as_float(extracted_value)
+        source_numeric = source_value
+        if extracted_numeric is None:
+            result.is_valid = False
+            result.confidence = 0.0
+            result.errors.append(f"Type conversion error: extracted={extracted_value} (type={type(extracted_value).__name__}), source={source_value} (type={type(source_value).__name__})")
             return result
         
         # Compare with tolerance
-        diff = abs(source_numeric - extracted_numeric)
-        rel_diff = diff / max(abs(source_numeric), 1e-9)
+        diff_class, diff, rel_diff = classify_value_diff(source_numeric, extracted_numeric)
         
-        if diff <= 1e-6:
+        if diff_class == DIFF_EXACT:
             # Perfect match
             pass  # confidence already 1.0
-        elif rel_diff < 0.01:
+        elif diff_class == DIFF_SMALL:
             # Within 1% - acceptable
-            result["confidence"] *= 0.98
-            result["errors"].append(f"Small diff: {diff:.6f}")
-        elif rel_diff < 0.05:
+            result.confidence *= 0.98
+            result.errors.append(f"Small diff: {diff:.6f}")
+        elif diff_class == DIFF_MODERATE:
             # Within 5% - moderate error
-            result["is_valid"] = False
-            result["confidence"] = 0.7
-            result["errors"].append(f"Moderate diff: extracted={extracted_numeric}, source={source_numeric}, diff={diff:.2f}")
-            
-            # Add fix instructions
-            result["fix_instructions"].append(f"FIX: Value mismatch (5% error)")
-            result["fix_instructions"].append(f"  - Extracted: {extracted_numeric}")
-            result["fix_instructions"].append(f"  - Source at [{row_idx}][{col_idx}]: {source_numeric} (text: '{cell_text}')")
-            result["fix_instructions"].append(f"SOLUTION: Check if value appears in adjacent cells:")
-            # Check adjacent cells
-            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                nr, nc = row_idx + dr, col_idx + dc
-                if 0 <= nr < len(rows) and 0 <= nc < len(rows[nr]):
-                    adj_val = parse_numeric_value(str(rows[nr][nc]))
-                    if adj_val == extracted_numeric:
-                        result["fix_instructions"].append(f"  → Found {extracted_numeric} at [{nr}][{nc}]: rows[{nr}][{nc}]='{rows[nr][nc]}'")
-                        result["fix_instructions"].append(f"  → Update indices: row_idx: {row_idx} → {nr}, col_idx: {col_idx} → {nc}")
+            result.is_valid = False
+            result.confidence = 0.7
+            result.errors.append(f"Moderate diff: extracted={extracted_numeric}, source={source_numeric}, diff={diff:.2f}")
+            _defer_fix(result, "moderate_diff", row_idx, col_idx, extracted_numeric, source_numeric, cell_text)
         else:
             # Large difference - try col_idx+1 as fallback before marking invalid
             # This catches cases where LLM used col_idx when it should be col_idx+1
             tried_fallback = False
-            if col_idx + 1 < len(rows[row_idx]):
+            if col_idx + 1 < row_len:
                 alt_cell_text = rows[row_idx][col_idx + 1]
-                alt_source_value = parse_numeric_value(str(alt_cell_text))
+                alt_source_value = parsed[row_idx][col_idx + 1]
                 
                 if alt_source_value is not None:
-                    try:
-                        alt_source_numeric = float(alt_source_value) if not isinstance(alt_source_value, (int, float)) else alt_source_value
-                        alt_diff = abs(alt_source_numeric - extracted_numeric)
-                        alt_rel_diff = alt_diff / max(abs(alt_source_numeric), 1e-9)
+                    alt_class, alt_diff, alt_rel_diff = classify_value_diff(alt_source_value, extracted_numeric)
+                    
+                    # If col_idx+1 is a much better match, use it
+                    if alt_class == DIFF_EXACT or (alt_class == DIFF_SMALL and alt_rel_diff < rel_diff * 0.5):
+                        tried_fallback = True
+                        result.errors.append(f"⚠ Auto-corrected: col_idx={col_idx} → col_idx={col_idx+1}, value match improved ({source_numeric} → {alt_source_value})")
+                        result.col_idx = col_idx + 1
+                        result.source_cell_text = alt_cell_text
+                        result.source_cell_value = alt_source_value
+                        result.confidence *= 0.95
+                        
+                        # Update col_name_match if available
+                        if merged_headers and col_idx + 1 < len(merged_headers):
+                            result.col_name_match = merged_headers[col_idx + 1]
                         
-                        # If col_idx+1 is a much better match, use it
-                        if alt_diff <= 1e-6 or (alt_rel_diff < 0.01 and alt_rel_diff < rel_diff * 0.5):
-                            tried_fallback = True
-                            result["errors"].append(f"⚠ Auto-corrected: col_idx={col_idx} → col_idx={col_idx+1}, value match improved ({source_numeric} → {alt_source_numeric})")
-                            result["col_idx"] = col_idx + 1
-                            result["source_cell_text"] = alt_cell_text
-                            result["source_cell_value"] = alt_source_value
-                            result["confidence"] *= 0.95
-                            
-                            # Update col_name_match if available
-                            if merged_headers and col_idx + 1 < len(merged_headers):
-                                result["col_name_match"] = merged_headers[col_idx + 1]
-                            
-                            # Re-validate with corrected value
-                            if alt_diff <= 1e-6:
-                                result["is_valid"] = True
-                            elif alt_rel_diff < 0.01:
-                                result["is_valid"] = True
-                                result["confidence"] *= 0.98
-                                result["errors"].append(f"Small diff after correction: {alt_diff:.6f}")
-                            elif alt_rel_diff < 0.05:
-                                result["is_valid"] = False
-                                result["confidence"] = 0.7
-                                result["errors"].append(f"Moderate diff after correction: {alt_diff:.2f}")
-                            else:
-                                result["is_valid"] = False
-                                result["confidence"] = 0.3
-                                result["errors"].append(f"Large diff even after correction: {alt_diff:.2f}")
-                            
-                            return result
-                    except (ValueError, TypeError):
-                        pass
+                        # Re-validate with corrected value
+                        if alt_class == DIFF_EXACT:
+                            result.is_valid = True
+                        elif alt_class == DIFF_SMALL:
+                            result.is_valid = True
+                            result.confidence *= 0.98
+                            result.errors.append(f"Small diff after correction: {alt_diff:.6f}")
+                        elif alt_class == DIFF_MODERATE:
+                            result.is_valid = False
+                            result.confidence = 0.7
+                            result.errors.append(f"Moderate diff after correction: {alt_diff:.2f}")
+                        else:
+                            result.is_valid = False
+                            result.confidence = 0.3
+                            result.errors.append(f"Large diff even after correction: {alt_diff:.2f}")
+                        
+                        return result
             
             # If fallback didn't help or wasn't available, mark as invalid
             if not tried_fallback:
-                result["is_valid"] = False
-                result["confidence"] = 0.3
-                result["errors"].append(f"Large diff: extracted={extracted_numeric}, source={source_numeric}, diff={diff:.2f}")
-                
-                # Add fix instructions for large difference
-                result["fix_instructions"].append(f"FIX: Large value mismatch (>5% error)")
-                result["fix_instructions"].append(f"  - Extracted: {extracted_numeric}")
-                result["fix_instructions"].append(f"  - Source at [{row_idx}][{col_idx}]: {source_numeric} (text: '{cell_text}')")
-                result["fix_instructions"].append(f"SOLUTION: Search nearby cells for the extracted value {extracted_numeric}:")
-                # Check all adjacent cells
+                result.is_valid = False
+                result.confidence = 0.3
+                result.errors.append(f"Large diff: extracted={extracted_numeric}, source={source_numeric}, diff={diff:.2f}")
+                _defer_fix(result, "large_diff", row_idx, col_idx, extracted_numeric, source_numeric, cell_text)
+    
+    return result
+
+
+def _defer_fix(result: KpiValidation, kind: str, *args: Any) -> None:
+    """Record a fix for build_fix_instructions() to expand if the result is written."""
+    if result.fixes is None:
+        result.fixes = []
+    result.fixes.append((kind, args))
+
+
+def build_fix_instructions(
+    validation: KpiValidation,
+    kpi: Dict[str, Any],
+    table_data: Dict[str, Any],
+    search_fixes: bool = True,
+    source: Optional[SourceTable] = None
+) -> List[str]:
+    """
+    Expand the fixes recorded by validate_kpi_indexed into readable instructions.
+    
+    Instructions are only needed for KPIs that end up in the invalid report,
+    so they are built here on demand instead of for every KPI validated.
+    With search_fixes=False the neighbouring-cell search for value mismatches
+    is skipped. source is the table's prepare_source_table() result, built
+    here when omitted. Stores the list in validation.fix_instructions and
+    returns it.
+    """
+    rows = table_data.get('rows', [])
+    stub_col = table_data.get('stub_col', [])
+    merged_headers = table_data.get('merged_headers', [])
+    if source is None:
+        source = prepare_source_table(table_data)
+    parsed = source.parsed
+    
+    fix = []
+    for kind, args in validation.fixes or ():
+        if kind == "key_name":
+            kpi_name = kpi.get("name", "")
+            kpi_key = kpi.get("key", "")
+            table_title = table_data.get('title', '')
+            section_name = table_data.get('section_name', '')
+            fix.append(f"FIX: key='{kpi_key}' and name='{kpi_name}' are identical. Look at table context:")
+            fix.append(f"  - Table title: '{table_title}'")
+            fix.append(f"  - Section: '{section_name}'")
+            fix.append(f"  - Current row: '{kpi.get('row_name', '')}'")
+            fix.append(f"SOLUTION: Determine which is the metric (name) vs entity (key):")
+            fix.append(f"  - If table measures production/sales of vehicles: name='Production' or 'Sales', key='{kpi_key}'")
+            fix.append(f"  - If table shows KPIs for a company/brand: name='{kpi_name}', key='Company'/'Brand'")
+            fix.append(f"  - Check title and section to determine the correct interpretation")
+        
+        elif kind == "row_name":
+            row_idx, row_name, expected_row_name = args
+            fix.append(f"FIX: row_idx={row_idx} points to wrong row")
+            fix.append(f"  - Current: row_name='{row_name}' but stub_col[{row_idx}]='{expected_row_name}'")
+            fix.append(f"SOLUTION: Search stub_col for the correct row_idx where value matches '{row_name}':")
+            matches = source.stub_idx.get(str(row_name).strip().lower())
+            if matches:
+                i = matches[0]
+                stub_name = stub_col[i]
+                fix.append(f"  → Found at row_idx={i}, stub_col[{i}]='{stub_name}'")
+                fix.append(f"  → Update: row_idx: {row_idx} → {i}, row_name: '{expected_row_name}' → '{stub_name}'")
+        
+        elif kind == "col_name":
+            # Warning, not critical
+            col_idx, col_name, expected_col_name = args
+            fix.append(f"WARNING: col_idx={col_idx} may point to wrong column")
+            fix.append(f"  - Current: col_name='{col_name}' but merged_headers[{col_idx}]='{expected_col_name}'")
+            fix.append(f"SOLUTION: Search merged_headers for correct col_idx where value matches '{col_name}':")
+            for i in source.hdr_idx.get(str(col_name).strip().lower(), ()):
+                header = merged_headers[i]
+                fix.append(f"  → Found at col_idx={i}, merged_headers[{i}]='{header}'")
+                fix.append(f"  → Consider updating: col_idx: {col_idx} → {i}, col_name: '{expected_col_name}' → '{header}'")
+        
+        elif kind == "moderate_diff":
+            row_idx, col_idx, extracted_numeric, source_numeric, cell_text = args
+            fix.append(f"FIX: Value mismatch (5% error)")
+            fix.append(f"  - Extracted: {extracted_numeric}")
+            fix.append(f"  - Source at [{row_idx}][{col_idx}]: {source_numeric} (text: '{cell_text}')")
+            fix.append(f"SOLUTION: Check if value appears in adjacent cells:")
+            # Check adjacent cells
+            if search_fixes:
+                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    nr, nc = row_idx + dr, col_idx + dc
+                    if 0 <= nr < len(rows) and 0 <= nc < len(rows[nr]):
+                        adj_val = parsed[nr][nc]
+                        if adj_val == extracted_numeric:
+                            fix.append(f"  → Found {extracted_numeric} at [{nr}][{nc}]: rows[{nr}][{nc}]='{rows[nr][nc]}'")
+                            fix.append(f"  → Update indices: row_idx: {row_idx} → {nr}, col_idx: {col_idx} → {nc}")
+        
+        elif kind == "large_diff":
+            row_idx, col_idx, extracted_numeric, source_numeric, cell_text = args
+            fix.append(f"FIX: Large value mismatch (>5% error)")
+            fix.append(f"  - Extracted: {extracted_numeric}")
+            fix.append(f"  - Source at [{row_idx}][{col_idx}]: {source_numeric} (text: '{cell_text}')")
+            fix.append(f"SOLUTION: Search nearby cells for the extracted value {extracted_numeric}:")
+            # Check all adjacent cells
+            if search_fixes:
                 for dr in [-1, 0, 1]:
                     for dc in [-1, 0, 1]:
                         if dr == 0 and dc == 0:
                             continue
                         nr, nc = row_idx + dr, col_idx + dc
                         if 0 <= nr < len(rows) and 0 <= nc < len(rows[nr]):
-                            adj_val = parse_numeric_value(str(rows[nr][nc]))
-                            if adj_val is not None and abs(adj_val - extracted_numeric) <= 1e-6:
-                                result["fix_instructions"].append(f"  → FOUND at [{nr}][{nc}]: {adj_val} (text: '{rows[nr][nc]}')")
-                                result["fix_instructions"].append(f"  → Update indices: row_idx: {row_idx} → {nr}, col_idx: {col_idx} → {nc}")
+                            adj_val = parsed[nr][nc]
+                            if adj_val is not None and abs(adj_val - extracted_numeric) <= EXACT_TOLERANCE:
+                                fix.append(f"  → FOUND at [{nr}][{nc}]: {adj_val} (text: '{rows[nr][nc]}')")
+                                fix.append(f"  → Update indices: row_idx: {row_idx} → {nr}, col_idx: {col_idx} → {nc}")
                                 if stub_col and nr < len(stub_col):
-                                    result["fix_instructions"].append(f"  → Update row_name: '{kpi.get('row_name')}' → '{stub_col[nr]}'")
+                                    fix.append(f"  → Update row_name: '{kpi.get('row_name')}' → '{stub_col[nr]}'")
                                 if merged_headers and nc < len(merged_headers):
-                                    result["fix_instructions"].append(f"  → Update col_name: '{kpi.get('col_name')}' → '{merged_headers[nc]}'")
+                                    fix.append(f"  → Update col_name: '{kpi.get('col_name')}' → '{merged_headers[nc]}'")
     
-    return result
+    validation.fix_instructions = fix
+    validation.fixes = None
+    return fix
+
+
+def _peek_table_id(line: bytes) -> Optional[str]:
+    """
+    Read the table_id of a raw tables-file line without decoding the rest.
+    
+    Returns None when the id can't be read cheaply (missing, not a plain
+    string, containing escapes, or not clearly the top-level key); callers
+    then decode the full line.
+    """
+    pos = line.find(b'"table_id"')
+    if pos == -1:
+        return None
+    # Only trust a match ahead of any array or nested object, so a cell or
+    # nested key that happens to read "table_id" is never taken for the id
+    opening = line.find(b'{')
+    if opening == -1 or opening > pos:
+        return None
+    if line.find(b'{', opening + 1, pos) != -1 or line.find(b'[', 0, pos) != -1:
+        return None
+    colon = pos + 10
+    while line[colon:colon + 1] in (b' ', b'\t'):
+        colon += 1
+    if line[colon:colon + 1] != b':':
+        return None
+    start = colon + 1
+    while line[start:start + 1] in (b' ', b'\t'):
+        start += 1
+    if line[start:start + 1] != b'"':
+        return None
+    end = line.find(b'"', start + 1)
+    if end == -1:
+        return None
+    raw = line[start + 1:end]
+    if b'\\' in raw:
+        return None
+    return raw.decode('utf-8')
+
 
+def _year_from_filename(name: str) -> Optional[str]:
+    """Return the YYYY in '...linked_tables(YYYY)...', or None."""
+    i = name.find('linked_tables(')
+    if i != -1:
+        year = name[i + 14:i + 18]
+        if len(year) == 4 and year.isdigit() and name[i + 18:i + 19] == ')':
+            return year
+    # Unusual names (e.g. a second 'linked_tables(' occurrence) take the slow path
+    match = _YEAR_RE.search(name)
+    return match.group(1) if match else None
 
-def validate_extraction_file(extraction_file: Path, tables_dir: Path) -> Dict[str, Any]:
+
+def validate_extraction_file(
+    extraction_file: Path,
+    tables_dir: Path,
+    search_fixes: bool = True
+) -> Dict[str, Any]:
     """
     Validate one extraction file using index-based lookup.
     
@@ -421,14 +716,15 @@ def validate_extraction_file(extraction_file: Path, tables_dir: Path) -> Dict[st
     6. For each KPI, use row_idx and col_idx DIRECTLY (no string matching)
     7. Access cell value: rows[row_idx][col_idx]
     8. Compare extracted value vs source value
+    
+    search_fixes is passed through to build_fix_instructions().
     """
     # Step 1: Extract year from filename
-    match = re.search(r'linked_tables\((\d{4})\)', extraction_file.name)
-    if not match:
+    year = _year_from_filename(extraction_file.name)
+    if year is None:
         print(f"⚠️  Could not extract year from {extraction_file.name}")
         return None
     
-    year = match.group(1)
     tables_file = tables_dir / f'linked_tables({year}).jsonl'
     
     if not tables_file.exists():
@@ -436,19 +732,24 @@ def validate_extraction_file(extraction_file: Path, tables_dir: Path) -> Dict[st
         return None
     
     # Step 2: Load extraction data
-    with open(extraction_file, 'r', encoding='utf-8') as f:
-        extraction_data = json.load(f)
+    with open(extraction_file, 'rb') as f:
+        extraction_data = _json_loads(f.read())
     
-    # Step 3: Load source tables into dictionary keyed by table_id
+    # Step 3: Load the referenced source tables into dictionary keyed by table_id
+    # (lines for other tables are skipped on their raw table_id, never decoded)
+    referenced = {t.get('table_id') for t in extraction_data.get('tables', [])}
     tables = {}
-    with open(tables_file, 'r', encoding='utf-8') as f:
+    with open(tables_file, 'rb') as f:
         for line in f:
-            table = json.loads(line)
+            table_id = _peek_table_id(line)
+            if table_id is not None and table_id not in referenced:
+                continue
+            table = _json_loads(line)
             table_id = table.get('table_id')
-            if table_id:
+            if table_id and table_id in referenced:
                 tables[table_id] = table
     
-    print(f"   Loaded {len(tables)} source tables from {tables_file.name}")
+    print(f"   Loaded {len(tables)} referenced source tables from {tables_file.name}")
     
     # Validation results
     invalid_kpis = []
@@ -480,61 +781,59 @@ def validate_extraction_file(extraction_file: Path, tables_dir: Path) -> Dict[st
             continue
         
         stats["tables_processed"] += 1
+        source = prepare_source_table(source_table)
         
         # Step 5: Loop through all KPIs in this table
         for kpi in kpis:
             stats["total_kpis"] += 1
+            name, key, units, value, kpi_year, row_idx, col_idx, row_name, col_name = map(kpi.get, KPI_FIELDS)
             
             # Step 6-8: Validate using indices directly
-            validation = validate_kpi_indexed(kpi, source_table)
+            validation = validate_kpi_indexed(kpi, source_table, source)
             
             # Count name verification results
-            for err in validation["errors"]:
-                if "✓ row_name verified" in err:
-                    stats["row_name_verified"] += 1
-                elif "✗ row_name MISMATCH" in err or "row_name mismatch" in err:
-                    stats["row_name_mismatches"] += 1
-                    stats["name_mismatches"] += 1
-                
-                if "✓ col_name verified" in err:
-                    stats["col_name_verified"] += 1
-                elif "✗ col_name MISMATCH" in err or "col_name mismatch" in err:
-                    stats["col_name_mismatches"] += 1
-                    stats["name_mismatches"] += 1
+            row_flag = validation.row_flag
+            col_flag = validation.col_flag
+            stats["row_name_verified"] += row_flag == NAME_VERIFIED
+            stats["col_name_verified"] += col_flag == NAME_VERIFIED
+            stats["row_name_mismatches"] += row_flag == NAME_MISMATCH
+            stats["col_name_mismatches"] += col_flag == NAME_MISMATCH
+            stats["name_mismatches"] += (row_flag == NAME_MISMATCH) + (col_flag == NAME_MISMATCH)
             
-            if validation["is_valid"]:
+            if validation.is_valid:
                 stats["valid_kpis"] += 1
                 # Save valid KPI with context
                 valid_kpis.append({
-                    "name": kpi.get("name"),
-                    "key": kpi.get("key"),
-                    "units": kpi.get("units"),
-                    "value": kpi.get("value"),
-                    "year": kpi.get("year"),
+                    "name": name,
+                    "key": key,
+                    "units": units,
+                    "value": value,
+                    "year": kpi_year,
                     "evidence": {
                         "table_id": table_id,
-                        "row_idx": kpi.get("row_idx"),
-                        "col_idx": kpi.get("col_idx"),
-                        "row_name": kpi.get("row_name"),
-                        "col_name": kpi.get("col_name")
+                        "row_idx": row_idx,
+                        "col_idx": col_idx,
+                        "row_name": row_name,
+                        "col_name": col_name
                     },           
                 })
             else:
                 stats["invalid_kpis"] += 1
+                build_fix_instructions(validation, kpi, source_table, search_fixes, source)
                 # Save invalid KPI with context
                 invalid_kpis.append({
                     "table_id": table_id,
                     "kpi": {
-                        "name": kpi.get("name"),
-                        "key": kpi.get("key"),
-                        "units": kpi.get("units"),
-                        "year": kpi.get("year"),
-                        "row_idx": kpi.get("row_idx"),
-                        "col_idx": kpi.get("col_idx"),
-                        "row_name": kpi.get("row_name"),
-                        "col_name": kpi.get("col_name")
+                        "name": name,
+                        "key": key,
+                        "units": units,
+                        "year": kpi_year,
+                        "row_idx": row_idx,
+                        "col_idx": col_idx,
+                        "row_name": row_name,
+                        "col_name": col_name
                     },
-                    "validation": validation
+                    "validation": validation.to_dict()
                 })
     
     # Calculate accuracy
@@ -552,6 +851,26 @@ def validate_extraction_file(extraction_file: Path, tables_dir: Path) -> Dict[st
     }
 
 
+def _write_json(path: Path, data: Any) -> None:
+    """Write a report as indented UTF-8 JSON, serialized by orjson when installed."""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: stringify int/float keys like json.dumps does
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        # Encode first and write once; json.dump issues a write() per token
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    
+    # The payload is complete, so write it straight to the fd without a
+    # buffered file object in between
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def main():
     """
     Run index-based validation on Seventh-trial-deepseek folder.
@@ -595,6 +914,10 @@ def main():
     # DEMO MODE: Only process 2020 file for testing
     DEMO_MODE = False
     
+    # Set to False to skip the neighbouring-cell search in fix instructions
+    # when only accuracy stats are needed
+    SEARCH_FIXES = True
+    
     if DEMO_MODE:
         print("\n🔍 DEMO MODE: Processing 2020 only\n")
         extraction_files = list(extraction_dir.glob('*linked_tables(2020).json'))
@@ -608,109 +931,126 @@ def main():
     
     print(f"Found {len(extraction_files)} file(s) to process\n")
     
-    # Step 1: Loop through all files
+    # Step 1: Validate all files, one worker process per file
+    # (steps 2-4 happen inside validate_extraction_file)
+    validate = partial(validate_extraction_file, tables_dir=tables_dir, search_fixes=SEARCH_FIXES)
+    workers = min(len(extraction_files), os.cpu_count() or 1)
     results = []
-    for extraction_file in extraction_files:
-        print(f"\n{'=' * 70}")
-        print(f"Processing: {extraction_file.name}")
-        print(f"{'=' * 70}")
-        
-        # Validate this file (steps 2-4 happen inside this function)
-        result = validate_extraction_file(extraction_file, tables_dir)
-        
-        if result:
-            results.append(result)
+    totals = dict.fromkeys(SUMMARY_STATS, 0)  # running overall totals
+    # Report files are written on a thread pool so encoding and disk I/O
+    # overlap with validating the next file
+    report_writes = []
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=REPORT_WRITE_THREADS) as writer:
+        file_results = executor.map(validate, extraction_files) if workers > 1 else map(validate, extraction_files)
+        for extraction_file, result in zip(extraction_files, file_results):
+            # Each file's summary goes out in one write instead of one print per line
+            lines = []
+            out = lines.append
             
-            # Print summary
-            stats = result["stats"]
-            print(f"\n✅ Validation complete:")
-            print(f"   Tables processed: {stats['tables_processed']}")
-            print(f"   Total KPIs: {stats['total_kpis']}")
-            print(f"   Valid: {stats['valid_kpis']}")
-            print(f"   Invalid: {stats['invalid_kpis']}")
-            print(f"   Accuracy: {stats['accuracy']:.2f}%")
-            print(f"\n   Name Validation:")
-            print(f"   ✓ row_name verified: {stats['row_name_verified']}")
-            print(f"   ✓ col_name verified: {stats['col_name_verified']}")
-            print(f"   ✗ row_name mismatches: {stats['row_name_mismatches']}")
-            print(f"   ✗ col_name mismatches: {stats['col_name_mismatches']}")
-            print(f"   Total name issues: {stats['name_mismatches']}")
+            out(f"\n{'=' * 70}")
+            out(f"Processing: {extraction_file.name}")
+            out(f"{'=' * 70}")
             
-            # Save valid KPIs
-            if result["valid_kpis"]:
-                output_file = valid_dir / f"valid_{extraction_file.stem}.json"
-                valid_report = {
-                    "source_file": extraction_file.name,
-                    "year": result["year"],
-                    "validation_method": "index-based (row_idx, col_idx)",
-                    "total_valid": len(result["valid_kpis"]),
-                    "valid_kpis": result["valid_kpis"],
-                    "statistics": stats
-                }
+            if result:
+                # Only the per-file summary is kept for the overall totals, so
+                # each file's KPI lists are released once its reports are written
+                results.append({"file": result["file"], "year": result["year"], "stats": result["stats"]})
                 
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(valid_report, f, indent=2, ensure_ascii=False)
+                # Print summary
+                stats = result["stats"]
+                for k in SUMMARY_STATS:
+                    totals[k] += stats[k]
+                out(f"\n✅ Validation complete:")
+                out(f"   Tables processed: {stats['tables_processed']}")
+                out(f"   Total KPIs: {stats['total_kpis']}")
+                out(f"   Valid: {stats['valid_kpis']}")
+                out(f"   Invalid: {stats['invalid_kpis']}")
+                out(f"   Accuracy: {stats['accuracy']:.2f}%")
+                out(f"\n   Name Validation:")
+                out(f"   ✓ row_name verified: {stats['row_name_verified']}")
+                out(f"   ✓ col_name verified: {stats['col_name_verified']}")
+                out(f"   ✗ row_name mismatches: {stats['row_name_mismatches']}")
+                out(f"   ✗ col_name mismatches: {stats['col_name_mismatches']}")
+                out(f"   Total name issues: {stats['name_mismatches']}")
                 
-                print(f"   📄 Valid KPIs saved to: valid/{output_file.name}")
-            
-            # Save invalid KPIs
-            if result["invalid_kpis"]:
-                output_file = invalid_dir / f"invalid_{extraction_file.stem}.json"
-                invalid_report = {
-                    "source_file": extraction_file.name,
-                    "year": result["year"],
-                    "validation_method": "index-based (row_idx, col_idx)",
-                    "total_invalid": len(result["invalid_kpis"]),
-                    "invalid_kpis": result["invalid_kpis"],
-                    "statistics": stats
-                } 
-                
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(invalid_report, f, indent=2, ensure_ascii=False)
+                # Save valid KPIs
+                if result["valid_kpis"]:
+                    output_file = valid_dir / f"valid_{extraction_file.stem}.json"
+                    valid_report = {
+                        "source_file": extraction_file.name,
+                        "year": result["year"],
+                        "validation_method": "index-based (row_idx, col_idx)",
+                        "total_valid": len(result["valid_kpis"]),
+                        "valid_kpis": result["valid_kpis"],
+                        "statistics": stats
+                    }
+                    
+                    report_writes.append(writer.submit(_write_json, output_file, valid_report))
+                    
+                    out(f"   📄 Valid KPIs saved to: valid/{output_file.name}")
                 
-                print(f"   📄 Invalid KPIs saved to: invalid/{output_file.name}")
-            else:
-                print(f"   🎉 No invalid KPIs - 100% accuracy!")
+                # Save invalid KPIs
+                if result["invalid_kpis"]:
+                    output_file = invalid_dir / f"invalid_{extraction_file.stem}.json"
+                    invalid_report = {
+                        "source_file": extraction_file.name,
+                        "year": result["year"],
+                        "validation_method": "index-based (row_idx, col_idx)",
+                        "total_invalid": len(result["invalid_kpis"]),
+                        "invalid_kpis": result["invalid_kpis"],
+                        "statistics": stats
+                    } 
+                    
+                    report_writes.append(writer.submit(_write_json, output_file, invalid_report))
+                    
+                    out(f"   📄 Invalid KPIs saved to: invalid/{output_file.name}")
+                else:
+                    out(f"   🎉 No invalid KPIs - 100% accuracy!")
+            
+            sys.stdout.write("\n".join(lines) + "\n")
+        
+        # Surface any write error before reporting success
+        for write in report_writes:
+            write.result()
+    
+    # Overall summary, collected and written once
+    lines = []
+    out = lines.append
     
-    # Overall summary
     if results:
-        print("\n" + "=" * 70)
-        print("OVERALL SUMMARY (INDEX-BASED VALIDATION)")
-        print("=" * 70)
-        total_kpis = sum(r["stats"]["total_kpis"] for r in results)
-        total_valid = sum(r["stats"]["valid_kpis"] for r in results)
-        total_invalid = sum(r["stats"]["invalid_kpis"] for r in results)
-        total_row_verified = sum(r["stats"]["row_name_verified"] for r in results)
-        total_col_verified = sum(r["stats"]["col_name_verified"] for r in results)
-        total_row_mismatches = sum(r["stats"]["row_name_mismatches"] for r in results)
-        total_col_mismatches = sum(r["stats"]["col_name_mismatches"] for r in results)
-        total_mismatches = sum(r["stats"]["name_mismatches"] for r in results)
-        overall_accuracy = (total_valid / total_kpis * 100) if total_kpis > 0 else 0
+        out("\n" + "=" * 70)
+        out("OVERALL SUMMARY (INDEX-BASED VALIDATION)")
+        out("=" * 70)
+        total_kpis = totals["total_kpis"]
+        overall_accuracy = (totals["valid_kpis"] / total_kpis * 100) if total_kpis > 0 else 0
         
-        print(f"Files processed: {len(results)}")
-        print(f"Total KPIs: {total_kpis}")
-        print(f"Valid: {total_valid}")
-        print(f"Invalid: {total_invalid}")
-        print(f"Overall Accuracy: {overall_accuracy:.2f}%")
-        print(f"\nName Validation Summary:")
-        print(f"✓ row_name verified: {total_row_verified}")
-        print(f"✓ col_name verified: {total_col_verified}")
-        print(f"✗ row_name mismatches: {total_row_mismatches}")
-        print(f"✗ col_name mismatches: {total_col_mismatches}")
-        print(f"Total name issues: {total_mismatches}")
-        print("=" * 70)
-        print("\n💡 DUAL VALIDATION APPROACH:")
-        print("   PRIMARY: Uses row_idx and col_idx directly (instant cell access)")
-        print("   SECONDARY: Cross-validates with row_name and col_name")
-        print("   - Catches index errors (off-by-one, wrong convention)")
-        print("   - Catches name mismatches (LLM extraction errors)")
-        print("   - Ensures consistency between indices and names")
+        out(f"Files processed: {len(results)}")
+        out(f"Total KPIs: {total_kpis}")
+        out(f"Valid: {totals['valid_kpis']}")
+        out(f"Invalid: {totals['invalid_kpis']}")
+        out(f"Overall Accuracy: {overall_accuracy:.2f}%")
+        out(f"\nName Validation Summary:")
+        out(f"✓ row_name verified: {totals['row_name_verified']}")
+        out(f"✓ col_name verified: {totals['col_name_verified']}")
+        out(f"✗ row_name mismatches: {totals['row_name_mismatches']}")
+        out(f"✗ col_name mismatches: {totals['col_name_mismatches']}")
+        out(f"Total name issues: {totals['name_mismatches']}")
+        out("=" * 70)
+        out("\n💡 DUAL VALIDATION APPROACH:")
+        out("   PRIMARY: Uses row_idx and col_idx directly (instant cell access)")
+        out("   SECONDARY: Cross-validates with row_name and col_name")
+        out("   - Catches index errors (off-by-one, wrong convention)")
+        out("   - Catches name mismatches (LLM extraction errors)")
+        out("   - Ensures consistency between indices and names")
         
         if DEMO_MODE:
-            print("\n💡 To run on all files, set DEMO_MODE = False in the script")
+            out("\n💡 To run on all files, set DEMO_MODE = False in the script")
+    
+    out(f"\n✅ Valid reports saved to: {valid_dir}")
+    out(f"✅ Invalid reports saved to: {invalid_dir}")
     
-    print(f"\n✅ Valid reports saved to: {valid_dir}")
-    print(f"✅ Invalid reports saved to: {invalid_dir}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
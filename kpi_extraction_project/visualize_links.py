@@ -1,124 +1,162 @@
 """
 Visualize and analyze the KPI linking structure.
 """
+import heapq
 import json
+import sys
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+
+try:
+    import ijson
+except ImportError:  # optional dependency, lets large graphs load without the raw text in memory
+    ijson = None
 
 def analyze_links(links_file: Path):
     """Analyze the linking structure and show statistics."""
     
-    with open(links_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    nodes = data['nodes']
+    # Stream the node list when ijson is available; json.load holds the whole
+    # file text and the parsed tree at the same time
+    if ijson is not None:
+        with open(links_file, 'rb') as f:
+            nodes = list(ijson.items(f, 'nodes.item', use_float=True))
+    else:
+        with open(links_file, 'r', encoding='utf-8') as f:
+            nodes = json.load(f)['nodes']
     total_nodes = len(nodes)
     
-    # Build index for quick lookup
-    nodes_by_id = {n['kpi_id']: n for n in nodes}
-    
-    # Statistics
-    linked_nodes = sum(1 for n in nodes if n['next_kpi_id'] or n['prev_kpi_id'])
-    isolated_nodes = sum(1 for n in nodes if not n['next_kpi_id'] and not n['prev_kpi_id'])
+    # Statistics, chain heads (nodes with no prev) and a lookup index in a
+    # single pass. Only nodes with a prev can be the target of a next link,
+    # so heads (every isolated node included) stay out of the index
+    linked_nodes = 0
+    heads = []
+    successors = {}
+    for n in nodes:
+        prev_id = n['prev_kpi_id']
+        if prev_id or n['next_kpi_id']:
+            linked_nodes += 1
+        if prev_id:
+            successors[n['kpi_id']] = n
+        else:
+            heads.append(n)
+    isolated_nodes = total_nodes - linked_nodes
     
     # Find all temporal chains
     chains = []
-    visited = set()
+    walked = 0
     
-    for node in nodes:
-        if node['kpi_id'] in visited:
-            continue
-        
-        # Find chain start (node with no prev)
-        current = node
-        while current['prev_kpi_id']:
-            current = nodes_by_id[current['prev_kpi_id']]
-        
-        # Build chain from start
+    # Every chain starts at a head; walk forward from those only
+    for node in heads:
         chain = []
+        current = node
         while current:
             chain.append(current)
-            visited.add(current['kpi_id'])
-            current = nodes_by_id[current['next_kpi_id']] if current['next_kpi_id'] else None
+            next_id = current['next_kpi_id']
+            current = successors.get(next_id) if next_id else None
         
+        walked += len(chain)
         if len(chain) > 1:
             chains.append(chain)
-        elif len(chain) == 1 and not chain[0]['next_kpi_id'] and not chain[0]['prev_kpi_id']:
-            # Isolated node
-            pass
+    
+    # Anything left over sits on a cycle (no head); only track visited ids
+    # when the head walks did not cover every node
+    if walked != total_nodes:
+        visited = {n['kpi_id'] for n in heads}
+        visited.update(n['kpi_id'] for chain in chains for n in chain)
+        
+        # Collect each cycle once
+        for node in nodes:
+            if node['kpi_id'] in visited:
+                continue
+            
+            chain = []
+            current = node
+            while current and current['kpi_id'] not in visited:
+                chain.append(current)
+                visited.add(current['kpi_id'])
+                next_id = current['next_kpi_id']
+                current = successors.get(next_id) if next_id else None
+            
+            if len(chain) > 1:
+                chains.append(chain)
     
     # Chain statistics
     chain_lengths = [len(c) for c in chains]
     
-    print("=" * 80)
-    print("KPI LINKING ANALYSIS")
-    print("=" * 80)
-    print(f"\n📊 OVERALL STATISTICS:")
-    print(f"   Total nodes: {total_nodes}")
-    print(f"   Linked nodes: {linked_nodes} ({linked_nodes/total_nodes*100:.1f}%)")
-    print(f"   Isolated nodes: {isolated_nodes} ({isolated_nodes/total_nodes*100:.1f}%)")
-    print(f"   Temporal chains: {len(chains)}")
+    # Collect the report and write it once instead of one print per line
+    lines = []
+    out = lines.append
+    
+    out("=" * 80)
+    out("KPI LINKING ANALYSIS")
+    out("=" * 80)
+    out(f"\n📊 OVERALL STATISTICS:")
+    out(f"   Total nodes: {total_nodes}")
+    out(f"   Linked nodes: {linked_nodes} ({linked_nodes/total_nodes*100:.1f}%)")
+    out(f"   Isolated nodes: {isolated_nodes} ({isolated_nodes/total_nodes*100:.1f}%)")
+    out(f"   Temporal chains: {len(chains)}")
     
     if chain_lengths:
-        print(f"\n🔗 CHAIN STATISTICS:")
-        print(f"   Average chain length: {sum(chain_lengths)/len(chain_lengths):.1f} years")
-        print(f"   Longest chain: {max(chain_lengths)} years")
-        print(f"   Shortest chain: {min(chain_lengths)} years")
+        out(f"\n🔗 CHAIN STATISTICS:")
+        out(f"   Average chain length: {sum(chain_lengths)/len(chain_lengths):.1f} years")
+        out(f"   Longest chain: {max(chain_lengths)} years")
+        out(f"   Shortest chain: {min(chain_lengths)} years")
     
     # Show distribution of chain lengths
-    length_dist = defaultdict(int)
-    for length in chain_lengths:
-        length_dist[length] += 1
+    length_dist = Counter(chain_lengths)
     
-    print(f"\n📈 CHAIN LENGTH DISTRIBUTION:")
+    out(f"\n📈 CHAIN LENGTH DISTRIBUTION:")
     for length in sorted(length_dist.keys()):
         count = length_dist[length]
         bar = "█" * min(50, count)
-        print(f"   {length:2d} years: {count:4d} chains {bar}")
+        out(f"   {length:2d} years: {count:4d} chains {bar}")
     
     # Show sample chains
-    print(f"\n🔍 SAMPLE TEMPORAL CHAINS:")
-    
-    # Sort chains by length (longest first)
-    chains.sort(key=len, reverse=True)
-    
-    for i, chain in enumerate(chains[:5]):
-        print(f"\n   Chain {i+1}: {chain[0]['name']} - {chain[0]['key']}")
-        print(f"   Length: {len(chain)} years")
-        print(f"   Years: {min(n['year'] for n in chain)} → {max(n['year'] for n in chain)}")
-        print(f"   Temporal sequence:")
+    out(f"\n🔍 SAMPLE TEMPORAL CHAINS:")
+    
+    # Longest chains first (only the top 5 are shown, so no full sort)
+    for i, chain in enumerate(heapq.nlargest(5, chains, key=len)):
+        out(f"\n   Chain {i+1}: {chain[0]['name']} - {chain[0]['key']}")
+        out(f"   Length: {len(chain)} years")
+        # link_kpis links each group in year order, so a chain's ends are its range
+        out(f"   Years: {chain[0]['year']} → {chain[-1]['year']}")
+        out(f"   Temporal sequence:")
         for node in chain:
-            print(f"      {node['year']}: {node['value']} {node['units']}")
+            out(f"      {node['year']}: {node['value']} {node['units']}")
     
     # Group analysis
-    print(f"\n📋 UNIQUE KPI GROUPS (name + key):")
-    groups = defaultdict(list)
+    out(f"\n📋 UNIQUE KPI GROUPS (name + key):")
+    # Only the distinct years are needed per group, so collect them as sets
+    # directly; groups without any year still count towards the total
+    groups = defaultdict(set)
     for node in nodes:
-        key = (node['name'], node['key'])
-        groups[key].append(node)
+        gyears = groups[(node['name'], node['key'])]
+        year = node['year']
+        if year:
+            gyears.add(year)
     
-    print(f"   Total unique groups: {len(groups)}")
+    out(f"   Total unique groups: {len(groups)}")
     
     # Show groups with most temporal coverage
     group_stats = []
-    for (name, key), gnodes in groups.items():
-        years = sorted(set(n['year'] for n in gnodes if n['year']))
+    for (name, key), gyears in groups.items():
+        years = sorted(gyears)
         if years:
             group_stats.append({
                 'name': name,
                 'key': key,
                 'years': years,
                 'count': len(years),
-                'range': f"{min(years)}-{max(years)}" if years else "N/A"
+                'range': f"{years[0]}-{years[-1]}"
             })
     
-    group_stats.sort(key=lambda x: x['count'], reverse=True)
+    out(f"\n   Top 10 groups by temporal coverage:")
+    for i, g in enumerate(heapq.nlargest(10, group_stats, key=lambda x: x['count']), 1):
+        out(f"   {i:2d}. {g['name']} | {g['key']}")
+        out(f"       Coverage: {g['count']} years ({g['range']})")
+        out(f"       Years: {g['years']}")
     
-    print(f"\n   Top 10 groups by temporal coverage:")
-    for i, g in enumerate(group_stats[:10], 1):
-        print(f"   {i:2d}. {g['name']} | {g['key']}")
-        print(f"       Coverage: {g['count']} years ({g['range']})")
-        print(f"       Years: {g['years']}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def main():
     base_dir = Path(__file__).parent
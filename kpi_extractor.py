@@ -3,6 +3,23 @@ from typing import Dict, List, Tuple, Optional, Set
 
 from tskg import KPIGraphBuilder, KPINode
 
+try:
+    import ahocorasick
+except ImportError:  # optional dependency, normalize_kpi_name falls back to substring checks
+    ahocorasick = None
+
+# Patterns used per header/cell, compiled once at import
+_YEAR_RE = re.compile(r'\b(20\d{2})\b')
+_YEAR_SUFFIX_RE = re.compile(r'\s*(20\d{2})\s*$')
+_PAREN_RE = re.compile(r'\((.*?)\)')
+_PAREN_STRIP_RE = re.compile(r'\s*\(.*?\)\s*')
+_FOOTNOTE_RE = re.compile(r'\s*\^\w*')
+_NONWORD_RE = re.compile(r'[^a-zA-Z0-9_]')
+_WORD_ALLOWED_RE = re.compile(r'^[a-zA-Z0-9\s\-\'&/\(\),\.%€$£¥°²³]+$')
+_HAS_LETTER_RE = re.compile(r'[a-zA-Z]')
+# Thousands separators and spaces dropped from numeric cells in one pass
+_STRIP_TABLE = str.maketrans('', '', ', ')
+
 class KPIExtractor:
     """Extracts KPIs from table data and builds semantic understanding"""
     
@@ -21,23 +38,45 @@ class KPIExtractor:
             'brand_sales': ['brand sales', 'model sales'],
             'financial_performance': ['financial performance', 'financial results']
         }
+        self._pattern_automaton = self._build_pattern_automaton()
+        # Table format per merged-header tuple; report templates repeat across pages
+        self._format_cache = {}
         builder = KPIGraphBuilder()
         self.graph = builder.graph
 
     def extract_year_from_header(self, header: str) -> Optional[int]:
         """Extract year from merged header like 'SALES REVENUE 2022'"""
-        year_match = re.search(r'\b(20\d{2})\b', header)
+        year_match = _YEAR_RE.search(header)
         return int(year_match.group(1)) if year_match else None
     
     def extract_kpi_name(self, header: str) -> str:
         """Extract KPI name from header, removing year"""
         # Remove year pattern
-        kpi_name = re.sub(r'\s*(20\d{2})\s*$', '', header)
+        kpi_name = _YEAR_SUFFIX_RE.sub('', header)
         return kpi_name.strip().lower() if kpi_name else None
     
+    def _build_pattern_automaton(self):
+        """Build an Aho-Corasick automaton over all KPI patterns, or None without pyahocorasick"""
+        if ahocorasick is None:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        # Value is (group position, label) so the earliest group wins, as in the loop
+        for priority, (normalized, patterns) in enumerate(self.kpi_patterns.items()):
+            for pattern in patterns:
+                if not automaton.exists(pattern):
+                    automaton.add_word(pattern, (priority, normalized))
+        automaton.make_automaton()
+        return automaton
+    
     def normalize_kpi_name(self, kpi_name: str) -> str:
         """Normalize KPI names for consistency"""
         kpi_name_lower = kpi_name.lower()
+        if self._pattern_automaton is not None:
+            # One scan of the name finds every pattern occurrence
+            best = min((hit for _, hit in self._pattern_automaton.iter(kpi_name_lower)), default=None)
+            return best[1] if best else kpi_name_lower
+        
         for normalized, patterns in self.kpi_patterns.items():
             for pattern in patterns:
                 if pattern in kpi_name_lower:
@@ -46,12 +85,35 @@ class KPIExtractor:
     
     def extract_units(self, header: str) -> str:
         """Extract measurement units from header"""
-        unit_match = re.search(r'\((.*?)\)', header)
+        unit_match = _PAREN_RE.search(header)
         return unit_match.group(1).strip() if unit_match else None
     
     def detect_table_format(self, merged_headers: List[str]) -> str:
-        """Detect the table format type based on the three patterns"""
-
+        """Detect the table format type, reusing the result for headers seen before"""
+        headers_key = tuple(merged_headers)
+        table_format = self._format_cache.get(headers_key)
+        if table_format is None:
+            table_format = self._detect_table_format(merged_headers)
+            self._format_cache[headers_key] = table_format
+        return table_format
+    
+    def _detect_table_format(self, merged_headers: List[str]) -> str:
+        """Detect the table format type based on the three patterns
+        
+        The cheap first/second header checks run first; the per-header Type 1 scan
+        only runs once Type 4 is ruled out. An empty first header cannot be a word
+        string, so Type 2 and Type 3 are exclusive and each only needs its own check.
+        """
+        first_header = merged_headers[0]
+        first_header_empty = first_header.strip() == ""
+        
+        # Type 4: Empty first header, years in subsequent headers, KPI context in title, individual KPIs in rows with units in parentheses
+        # merged_headers = ["", "2023", "2022", "%"] - Empty first header, then years
+        # title contains main KPI context like "VOLKSWAGEN COMMERCIAL VEHICLES – KEY FIGURES"
+        # rows like ["Deliveries (thousand units)", "409", "329", "24.6"]
+        if first_header_empty and self.is_string_number(merged_headers[1]):
+            return "type_4"  # Years in headers, KPI context in title, individual KPIs in rows with units in parentheses
+        
         # Type 1: Headers contain "KPI_NAME YEAR" (e.g., "SALES REVENUE 2022")
         # First header contains measurement units (thousands, millions, etc.), subsequent headers have KPI + year
         has_kpi_year_headers = all(
@@ -60,41 +122,29 @@ class KPIExtractor:
             for header in merged_headers[1:] if header
         )
         
-        # Type 2: Headers are just years, KPI in title, measurement units in first header
-        # merged_headers = ["Units", "2023", "2022"] or ["Thousands", "2023", "2022"]
-        has_year_only_with_units_header = (
-            not self.is_string_number(merged_headers[0]) and self.is_word_string(merged_headers[0])
-        )
-
-        # Type 3: Headers are just years, KPI in first column of each row, measurement units embedded in row data
-        # merged_headers = ["", "", "2022", "2021", "%"]
-        # Units can be in row text itself or in second column
-        #print(f"Detecting table format for title: {title}, merged_headers: {merged_headers[0].strip() == ''}, merged_headers: {merged_headers[1].strip() == ''}")
-
-        has_empty_first_header_with_years = (
-            ((merged_headers[0].strip() == "" and merged_headers[1].strip() == ""))
-        )
-        
-      # Type 4: Empty first header, years in subsequent headers, KPI context in title, individual KPIs in rows with units in parentheses
-        # merged_headers = ["", "2023", "2022", "%"] - Empty first header, then years
-        # title contains main KPI context like "VOLKSWAGEN COMMERCIAL VEHICLES – KEY FIGURES"
-        # rows like ["Deliveries (thousand units)", "409", "329", "24.6"]
-        type_4_condition = (
-            merged_headers[0].strip() == "" and self.is_string_number(merged_headers[1]) 
-        )
-
-
-        
-        if has_kpi_year_headers and not has_empty_first_header_with_years and not has_year_only_with_units_header and not type_4_condition:
-            return "type_1"  # Measurement units (thousands/millions) in first header + KPI & Year in subsequent headers
-        elif has_year_only_with_units_header and not has_empty_first_header_with_years and not has_kpi_year_headers and not type_4_condition:
-            return "type_2"  # Years only in headers, KPI in title, measurement units in first header
-        elif has_empty_first_header_with_years and not has_kpi_year_headers and not has_year_only_with_units_header and not type_4_condition:
-            return "type_3"  # Years only in headers, KPI in first column of rows, units embedded in row text
-        elif type_4_condition:
-            return "type_4"  # Years in headers, KPI context in title, individual KPIs in rows with units in parentheses
+        if first_header_empty:
+            # Type 3: Headers are just years, KPI in first column of each row, measurement units embedded in row data
+            # merged_headers = ["", "", "2022", "2021", "%"]
+            # Units can be in row text itself or in second column
+            has_empty_first_header_with_years = merged_headers[1].strip() == ""
+            if has_empty_first_header_with_years:
+                if not has_kpi_year_headers:
+                    return "type_3"  # Years only in headers, KPI in first column of rows, units embedded in row text
+                return "unknown_format"
         else:
-            return "unknown_format"
+            # Type 2: Headers are just years, KPI in title, measurement units in first header
+            # merged_headers = ["Units", "2023", "2022"] or ["Thousands", "2023", "2022"]
+            has_year_only_with_units_header = (
+                not self.is_string_number(first_header) and self.is_word_string(first_header)
+            )
+            if has_year_only_with_units_header:
+                if not has_kpi_year_headers:
+                    return "type_2"  # Years only in headers, KPI in title, measurement units in first header
+                return "unknown_format"
+        
+        if has_kpi_year_headers:
+            return "type_1"  # Measurement units (thousands/millions) in first header + KPI & Year in subsequent headers
+        return "unknown_format"
         
     def extract_kpis_from_table(self, table_data: Dict) -> List[KPINode]:
         """Extract all KPIs from a single table with format detection"""
@@ -153,7 +203,8 @@ class KPIExtractor:
                     continue
                 
                 header = data_headers[col_idx]
-                if not self.is_valid_value(value):
+                cleaned_value = self._parse_value(value)
+                if cleaned_value is None:
                     continue
                 
                 year = self.extract_year_from_header(header)
@@ -161,8 +212,6 @@ class KPIExtractor:
                     continue
                 
                 kpi_name = self.extract_kpi_name(header)
-            
-                cleaned_value = self.clean_value(value)
                 
                 # Calculate actual column position (add 1 for the skipped first column)
                 actual_col_idx = col_idx + 1    
@@ -227,11 +276,10 @@ class KPIExtractor:
                     continue
                 
                 value = data_values[col_idx]
-                if not self.is_valid_value(value):
+                cleaned_value = self._parse_value(value)
+                if cleaned_value is None:
                     continue
                 
-                cleaned_value = self.clean_value(value)
-                
                 # Get the original header text for this column
                 header = data_headers[col_idx] if col_idx < len(data_headers) else str(year)
                 # Calculate actual column position (add 1 for the skipped first column)
@@ -307,11 +355,10 @@ class KPIExtractor:
                     continue
                 
                 value = data_values[adjusted_col_idx]
-                if not self.is_valid_value(value):
+                cleaned_value = self._parse_value(value)
+                if cleaned_value is None:
                     continue
                 
-                cleaned_value = self.clean_value(value)
-                
                 # Get the original header text for this column
                 header = data_headers[col_idx] if col_idx < len(data_headers) else str(year)
                 # Calculate actual column position in original row
@@ -373,11 +420,10 @@ class KPIExtractor:
                     continue
                 
                 value = data_values[col_idx]
-                if not self.is_valid_value(value):
+                cleaned_value = self._parse_value(value)
+                if cleaned_value is None:
                     continue
                 
-                cleaned_value = self.clean_value(value)
-                
                 # Get the original header text for this column
                 header = data_headers[col_idx] if col_idx < len(data_headers) else str(year)
                 # Calculate actual column position in original row
@@ -408,7 +454,7 @@ class KPIExtractor:
         kpi_context = kpi_part.lower().replace(' ', '_')
         
         # Remove any non-alphanumeric characters except underscores
-        kpi_context = re.sub(r'[^a-zA-Z0-9_]', '', kpi_context)
+        kpi_context = _NONWORD_RE.sub('', kpi_context)
         
         return kpi_context if kpi_context else 'general_metric'
     
@@ -429,10 +475,10 @@ class KPIExtractor:
         Example: 'Deliveries (thousand units)' -> {'kpi': 'deliveries', 'units': 'thousand units'}
         """
         # Extract measurement units from parentheses (thousands, millions, etc.)
-        units_match = re.search(r'\((.*?)\)', key)
+        units_match = _PAREN_RE.search(key)
         units = units_match.group(1).strip() if units_match else 'N/A'  
         # Remove units from key to get KPI name
-        kpi_text = re.sub(r'\s*\(.*?\)\s*', '', key).strip()
+        kpi_text = _PAREN_STRIP_RE.sub('', key).strip()
         
         return {
             'kpi': kpi_text,
@@ -447,7 +493,7 @@ class KPIExtractor:
         first_header = merged_headers[0]
         
         # Try to extract from parentheses first
-        units_match = re.search(r'\((.*?)\)', first_header)
+        units_match = _PAREN_RE.search(first_header)
         if units_match:
             units_text = units_match.group(1).strip()
         else:
@@ -477,28 +523,34 @@ class KPIExtractor:
         """Infer KPI from table context (legacy method, replaced by infer_kpi_from_title)"""
         return self.infer_kpi_from_title(table_data.get('title', ''))
     
-    def is_valid_value(self, value: str) -> bool:
-        """Check if a value is valid for KPI extraction"""
+    def _parse_value(self, value: str) -> Optional[float]:
+        """Validate and convert a cell in one pass; None if it is not a valid KPI value
+        
+        The extractors call this once per cell instead of is_valid_value followed by
+        clean_value, which cleaned and converted every valid cell twice.
+        """
         if not value or value.strip() == "":
-            return False
+            return None
         
         value = value.strip()
         
         # Skip common non-data values
         if value in ["–", "-", "N/A", "n/a", "x", ""]:
-            return False
+            return None
         
         # Check if it looks like a number (possibly with footnotes)
         # Remove footnote markers like ^1, ^2, etc.
-        clean_value = re.sub(r'\s*\^\w*', '', value)
-        clean_value = clean_value.replace(',', '').replace(' ', '')
+        clean_value = _FOOTNOTE_RE.sub('', value).translate(_STRIP_TABLE)
         
         # Check if it's a number (including negative numbers)
         try:
-            float(clean_value)
-            return True
+            return float(clean_value)
         except ValueError:
-            return False
+            return None
+    
+    def is_valid_value(self, value: str) -> bool:
+        """Check if a value is valid for KPI extraction"""
+        return self._parse_value(value) is not None
     
     def clean_value(self, value: str) -> float:
         """Clean and convert value to float"""
@@ -506,8 +558,7 @@ class KPIExtractor:
             return 0.0
         
         # Remove footnote markers and clean
-        clean_value = re.sub(r'\s*\^\w*', '', str(value))
-        clean_value = clean_value.replace(',', '').replace(' ', '').strip()
+        clean_value = _FOOTNOTE_RE.sub('', str(value)).translate(_STRIP_TABLE).strip()
         
         # Handle negative values
         if clean_value.startswith('-'):
@@ -537,9 +588,8 @@ class KPIExtractor:
             return False
         
         # Remove footnote markers like ^1, ^2, etc.
-        clean_value = re.sub(r'\s*\^\w*', '', value)
         # Remove commas and spaces (for thousands separators)
-        clean_value = clean_value.replace(',', '').replace(' ', '')
+        clean_value = _FOOTNOTE_RE.sub('', value).translate(_STRIP_TABLE)
         
         # Check for percentage signs and remove them
         if clean_value.endswith('%'):
@@ -572,12 +622,8 @@ class KPIExtractor:
         # Check if string contains only word characters, spaces, hyphens, apostrophes, parentheses, and common punctuation
         # This pattern allows for typical text like "Operating Result", "Vehicle Sales", "€ million", "Customer financing", etc.
         # Added currency symbols (€, $, £, ¥) and other common unit symbols
-        word_pattern = re.compile(r'^[a-zA-Z0-9\s\-\'&/\(\),\.%€$£¥°²³]+$')
-        
         # Must contain at least one letter to be considered a "word string"
-        has_letter = re.search(r'[a-zA-Z]', value)
-        
-        return bool(word_pattern.match(value) and has_letter)
+        return bool(_WORD_ALLOWED_RE.match(value) and _HAS_LETTER_RE.search(value))
 
     def _create_kpi_node(self, kpi_name: str, key: str, value: float, year: int,
                         table_data: Dict, row_idx: int = 0, col_idx: int = 0,